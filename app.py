@@ -1,8 +1,8 @@
 import streamlit as st
 import os
 from document_processor import DocumentProcessor
+from utils import detect_encoding
 import tempfile
-import chardet
 
 st.set_page_config(
     page_title="Content Filter AI",
@@ -10,13 +10,6 @@ st.set_page_config(
     layout="wide"
 )
 
-def detect_encoding(file_path):
-    """Detect the encoding of a file"""
-    with open(file_path, 'rb') as file:
-        raw_data = file.read()
-        result = chardet.detect(raw_data)
-        return result['encoding']
-
 def read_file_content(file_path, file_type):
     """Read file content with proper encoding detection"""
     if file_type == 'pdf':
@@ -0,0 +1,236 @@
+from typing import Dict, List, Optional, Tuple
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+
+SUPPORTED_EXTENSIONS = ('.txt', '.docx', '.pdf')
+
+# Per-process document processor, created by _init_worker
+_processor = None
+
+# Why this worker could not be set up; each of its documents then fails
+# with it instead of the pool respawning crashing workers forever
+_init_error = None
+
+def find_documents(input_dir: str) -> List[Tuple[str, int]]:
+    """
+    Find all supported documents under input_dir.
+    Returns (path, size) pairs sorted largest first, so the longest
+    documents start early and do not straggle at the end of the run.
+    """
+    documents = []
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                path = os.path.join(root, name)
+                documents.append((path, os.path.getsize(path)))
+    documents.sort(key=lambda document: document[1], reverse=True)
+    return documents
+
+def _init_worker(
+    threads_per_worker: int,
+    warm_images: bool,
+    verbose: bool,
+    metrics_dir: Optional[str] = None,
+    incremental: bool = False,
+    cache_path: Optional[str] = None,
+    cache_max_age: Optional[float] = None,
+    lexicon_path: Optional[str] = None,
+    expand_inflections: bool = False
+):
+    """
+    Create and warm this worker's DocumentProcessor.
+    With metrics_dir, the worker writes its metrics after every document
+    to metrics-<pid>.jsonl and metrics-<pid>.prom in that directory.
+    With cache_path, all workers share one SQLite verdict cache.
+    Progress is logged only when verbose; warnings are always shown.
+    Setup errors, e.g. a model missing from the cache, are kept in
+    _init_error rather than raised.
+    """
+    global _processor, _init_error
+
+    logging.basicConfig(
+        level=logging.INFO if verbose else logging.WARNING,
+        format=f"[worker {os.getpid()}] %(message)s",
+        force=True
+    )
+
+    # Keep workers from oversubscribing the cores with intra-op threads
+    os.environ['OMP_NUM_THREADS'] = str(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    try:
+        from document_processor import DocumentProcessor
+        from metrics import NULL_METRICS, JsonLinesSink, Metrics, PrometheusSink
+        
+        metrics = NULL_METRICS
+        if metrics_dir:
+            prefix = os.path.join(metrics_dir, f"metrics-{os.getpid()}")
+            metrics = Metrics([JsonLinesSink(prefix + ".jsonl"), PrometheusSink(prefix + ".prom")])
+        _processor = DocumentProcessor(
+            metrics=metrics,
+            incremental=incremental,
+            cache_path=cache_path,
+            cache_max_age=cache_max_age,
+            lexicon_path=lexicon_path,
+            expand_inflections=expand_inflections
+        )
+        _processor.warmup(images=warm_images)
+    except Exception as e:
+        _init_error = {
+            "error": f"Worker setup failed: {type(e).__name__}: {str(e)}",
+            "traceback": traceback.format_exc()
+        }
+        logging.getLogger(__name__).error(_init_error["error"])
+
+def _process_one(task: Tuple[str, str, int]) -> Dict:
+    """
+    Filter one document in a worker and return its stats record.
+    """
+    input_path, output_path, size = task
+    start = time.perf_counter()
+    record = {
+        "input_file": input_path,
+        "output_file": output_path,
+        "size_bytes": size,
+        "worker": os.getpid()
+    }
+    if _init_error is not None:
+        record["status"] = "error"
+        record.update(_init_error)
+        record["seconds"] = time.perf_counter() - start
+        return record
+    try:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        stats = _processor.process_document(input_path, output_path)
+        record.update(stats)
+        record["status"] = "ok"
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {str(e)}"
+        record["traceback"] = traceback.format_exc()
+    record["seconds"] = time.perf_counter() - start
+    return record
+
+def run_batch(
+    input_dir: str,
+    output_dir: str,
+    stats_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    threads_per_worker: int = 1,
+    warm_images: bool = False,
+    verbose: bool = False,
+    metrics_dir: Optional[str] = None,
+    incremental: bool = False,
+    cache_path: Optional[str] = None,
+    cache_max_age: Optional[float] = None,
+    lexicon_path: Optional[str] = None,
+    expand_inflections: bool = False
+) -> Dict:
+    """
+    Filter every supported document under input_dir into the same relative
+    path under output_dir, spreading documents across worker processes.
+    One JSON line of stats is written per document to stats_path.
+    With incremental, each output gets a segment manifest, and running the
+    batch again only sends new or changed content through the models.
+    With cache_path, toxicity verdicts are kept in a SQLite file shared by
+    the workers and by later runs. With lexicon_path, workers match that
+    lexicon and pick up edits to it between documents.
+
+    Returns a summary of the run.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats_path = stats_path or os.path.join(output_dir, 'filter_stats.jsonl')
+    os.makedirs(output_dir, exist_ok=True)
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    documents = find_documents(input_dir)
+    tasks = [
+        (path, os.path.join(output_dir, os.path.relpath(path, input_dir)), size)
+        for path, size in documents
+    ]
+    print(f"Found {len(tasks)} documents, processing with {workers} workers")
+
+    start = time.perf_counter()
+    succeeded = 0
+    failed = 0
+    with open(stats_path, 'w', encoding='utf-8') as stats_file, multiprocessing.Pool(
+        workers,
+        initializer=_init_worker,
+        initargs=(
+            threads_per_worker, warm_images, verbose, metrics_dir, incremental,
+            cache_path, cache_max_age, lexicon_path, expand_inflections
+        )
+    ) as pool:
+        for record in pool.imap_unordered(_process_one, tasks, chunksize=1):
+            stats_file.write(json.dumps(record) + '\n')
+            stats_file.flush()
+            if record["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+                print(f"Failed: {record['input_file']}: {record['error']}")
+            done = succeeded + failed
+            if done % 100 == 0 or done == len(tasks):
+                print(f"Processed {done}/{len(tasks)} documents")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(tasks),
+        "succeeded": succeeded,
+        "failed": failed,
+        "seconds": elapsed,
+        "docs_per_second": len(tasks) / elapsed if elapsed > 0 else 0.0,
+        "stats_file": stats_path
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Filter a directory tree of documents in parallel")
+    parser.add_argument("input_dir", help="Directory containing .txt, .docx and .pdf files")
+    parser.add_argument("output_dir", help="Directory for filtered documents (mirrors input_dir)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="Inference threads per worker")
+    parser.add_argument("--stats", default=None, help="JSON-lines stats file (default: output_dir/filter_stats.jsonl)")
+    parser.add_argument("--warm-images", action="store_true", help="Load image models when workers start")
+    parser.add_argument("--verbose", action="store_true", help="Show per-document output from workers")
+    parser.add_argument("--incremental", action="store_true", help="Reuse verdicts from the previous run's manifests")
+    parser.add_argument("--metrics-dir", default=None, help="Write per-worker metrics (JSON lines and Prometheus text) here")
+    parser.add_argument("--cache-path", default=None, help="SQLite file for toxicity verdicts shared across workers and runs")
+    parser.add_argument("--cache-max-age", type=float, default=None, help="Maximum age in seconds of cached verdicts")
+    parser.add_argument("--lexicon", default=None, help="Lexicon file with one inappropriate word or phrase per line")
+    parser.add_argument("--expand-inflections", action="store_true", help="Also match inflected variants of lexicon words")
+    args = parser.parse_args()
+
+    summary = run_batch(
+        args.input_dir,
+        args.output_dir,
+        stats_path=args.stats,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        warm_images=args.warm_images,
+        verbose=args.verbose,
+        metrics_dir=args.metrics_dir,
+        incremental=args.incremental,
+        cache_path=args.cache_path,
+        cache_max_age=args.cache_max_age,
+        lexicon_path=args.lexicon,
+        expand_inflections=args.expand_inflections
+    )
+    print("\nBatch complete!")
+    print(f"Documents: {summary['documents']}")
+    print(f"Succeeded: {summary['succeeded']}")
+    print(f"Failed: {summary['failed']}")
+    print(f"Throughput: {summary['docs_per_second']:.2f} docs/sec")
+    print(f"Stats written to: {summary['stats_file']}")
+
+if __name__ == "__main__":
+    main()
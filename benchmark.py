@@ -0,0 +1,440 @@
+from typing import Dict, List, Optional
+from PIL import Image
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import numpy as np
+import docx
+import fitz
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+CLEAN_SENTENCES = [
+    "The quarterly report was delivered to the board on time.",
+    "Please review the attached schedule before the meeting on Thursday.",
+    "Our team has finished migrating the archive to the new storage system.",
+    "The weather this weekend should be good enough for the trip.",
+    "Thank you for your help with the presentation yesterday.",
+    "Remember to update the inventory sheet after each delivery.",
+    "The library will be closed on Monday for maintenance.",
+    "We expect the new equipment to arrive early next month."
+]
+
+FLAGGED_SENTENCES = [
+    "This paragraph contains offensive language that should be removed.",
+    "Some explicit material was mentioned in the original draft.",
+    "That comment was inappropriate and everyone noticed.",
+    "You are an idiot and nobody wants to hear from you."
+]
+
+# Words the stub text classifier treats as toxic
+STUB_TOXIC_WORDS = ("idiot", "hate", "stupid", "kill")
+
+class StubTokenizer:
+    """
+    Whitespace tokenizer with the parts of the transformers tokenizer
+    interface the text scheduler uses.
+    """
+    is_fast = False
+
+    def num_special_tokens_to_add(self) -> int:
+        return 2
+
+    def __call__(self, texts: List[str], **kwargs) -> Dict:
+        return {"input_ids": [text.split() for text in texts]}
+
+class StubTextClassifier:
+    """
+    Deterministic stand-in for the toxicity pipeline: texts containing one
+    of STUB_TOXIC_WORDS score high on 'toxic', all others low.
+    """
+    labels = ["toxic", "severe_toxic", "obscene", "threat", "insult", "identity_hate"]
+
+    def __init__(self):
+        self.tokenizer = StubTokenizer()
+
+    def __call__(self, texts: List[str], batch_size: Optional[int] = None, truncation: bool = True) -> List[List[dict]]:
+        results = []
+        for text in texts:
+            lowered = text.lower()
+            toxic = any(word in lowered for word in STUB_TOXIC_WORDS)
+            results.append([
+                {"label": label, "score": 0.95 if toxic and label == "toxic" else 0.01}
+                for label in self.labels
+            ])
+        return results
+
+class StubImageClassifier:
+    """
+    Deterministic stand-in for an image model: the top label is chosen
+    from the mean pixel value, so identical buffers get identical results.
+    """
+    def __init__(self, labels: List[str], top_k: int = 5):
+        self.labels = labels
+        self.top_k = top_k
+
+    def _predict(self, pixels: np.ndarray) -> List[dict]:
+        index = int(pixels.mean()) % len(self.labels)
+        ranked = [self.labels[index]] + [label for label in self.labels if label != self.labels[index]]
+        return [
+            {"label": label, "score": 0.9 if rank == 0 else 0.1 / len(self.labels)}
+            for rank, label in enumerate(ranked[:self.top_k])
+        ]
+
+    def __call__(self, pixels, batch_size: Optional[int] = None):
+        if isinstance(pixels, np.ndarray) and pixels.ndim == 3:
+            return self._predict(pixels)
+        return [self._predict(buffer) for buffer in pixels]
+
+def install_stubs(processor):
+    """
+    Replace the processor's models with deterministic stubs, so the
+    benchmark runs offline and measures everything except inference.
+    """
+    processor.text_filter._toxicity_classifier = StubTextClassifier()
+    image_filter = processor.image_filter
+    image_filter._nsfw_classifier = StubImageClassifier(["normal", "neutral", "drawings", "sexy", "porn"])
+    image_filter._violence_classifier = StubImageClassifier(
+        ["tabby cat", "golden retriever", "sports car", "assault rifle", "cleaver knife", "mountain bike"]
+    )
+
+class CorpusGenerator:
+    def __init__(
+        self,
+        paragraphs: int = 200,
+        images: int = 4,
+        duplicate_ratio: float = 0.25,
+        pages: int = 10,
+        flagged_ratio: float = 0.1,
+        long_paragraph_ratio: float = 0.05,
+        image_size: int = 256,
+        seed: int = 0
+    ):
+        """
+        Initialize a generator of synthetic documents.
+
+        Args:
+            paragraphs: Text segments per document
+            images: Images per document (.docx and .pdf)
+            duplicate_ratio: Fraction of images that repeat an image already
+                used in the corpus
+            pages: Pages per .pdf document
+            flagged_ratio: Fraction of paragraphs containing lexicon words
+                or toxic phrases
+            long_paragraph_ratio: Fraction of paragraphs long enough to
+                exceed the toxicity model's input limit
+            image_size: Side of the generated images in pixels
+            seed: Seed for the random generator; the same settings and seed
+                always produce the same corpus
+        """
+        self.paragraphs = paragraphs
+        self.images = images
+        self.duplicate_ratio = duplicate_ratio
+        self.pages = pages
+        self.flagged_ratio = flagged_ratio
+        self.long_paragraph_ratio = long_paragraph_ratio
+        self.image_size = image_size
+        self.random = random.Random(seed)
+        self.numpy_random = np.random.RandomState(seed)
+        self._image_pool = []
+
+    def _paragraph(self) -> str:
+        """
+        Generate one paragraph of clean and flagged sentences.
+        """
+        count = 80 if self.random.random() < self.long_paragraph_ratio else self.random.randint(1, 5)
+        sentences = []
+        for _ in range(count):
+            if self.random.random() < self.flagged_ratio:
+                sentences.append(self.random.choice(FLAGGED_SENTENCES))
+            else:
+                sentences.append(self.random.choice(CLEAN_SENTENCES))
+        return " ".join(sentences)
+
+    def _image(self) -> bytes:
+        """
+        Generate PNG bytes, reusing an earlier image for duplicate_ratio of calls.
+        """
+        if self._image_pool and self.random.random() < self.duplicate_ratio:
+            return self.random.choice(self._image_pool)
+
+        size = self.image_size
+        kind = self.random.randint(0, 2)
+        if kind == 0:
+            pixels = self.numpy_random.randint(0, 256, (size, size, 3), dtype=np.uint8)
+        elif kind == 1:
+            ramp = np.linspace(0, 255, size, dtype=np.float32)
+            base = self.numpy_random.randint(0, 256, 3)
+            pixels = np.stack([
+                np.outer(np.ones(size), ramp),
+                np.outer(ramp, np.ones(size)),
+                np.full((size, size), base[2])
+            ], axis=-1).astype(np.uint8)
+        else:
+            # Blocky image, like a chart or a diagram
+            blocks = self.numpy_random.randint(0, 256, (8, 8, 3), dtype=np.uint8)
+            pixels = np.kron(blocks, np.ones((size // 8, size // 8, 1), dtype=np.uint8))
+
+        with io.BytesIO() as buffer:
+            Image.fromarray(pixels).save(buffer, format='PNG')
+            data = buffer.getvalue()
+        self._image_pool.append(data)
+        return data
+
+    def write_txt(self, path: str) -> Dict:
+        paragraphs = [self._paragraph() for _ in range(self.paragraphs)]
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write("\n".join(paragraphs) + "\n")
+        return {"segments": len(paragraphs), "images": 0}
+
+    def write_docx(self, path: str) -> Dict:
+        doc = docx.Document()
+        for _ in range(self.paragraphs):
+            doc.add_paragraph(self._paragraph())
+        for _ in range(self.images):
+            doc.add_picture(io.BytesIO(self._image()))
+        doc.save(path)
+        return {"segments": self.paragraphs, "images": self.images}
+
+    def write_pdf(self, path: str) -> Dict:
+        doc = fitz.open()
+        pages = max(1, self.pages)
+        for page_num in range(pages):
+            page = doc.new_page()
+            count = self.paragraphs // pages + (page_num < self.paragraphs % pages)
+            text = "\n".join(self._paragraph()[:400] for _ in range(count))
+            page.insert_textbox(fitz.Rect(36, 36, page.rect.width - 36, page.rect.height / 2), text, fontsize=6)
+            images = self.images // pages + (page_num < self.images % pages)
+            for index in range(images):
+                top = page.rect.height / 2 + 10 + (index % 3) * 120
+                left = 36 + (index // 3) * 120
+                page.insert_image(fitz.Rect(left, top, left + 110, top + 110), stream=self._image())
+        doc.save(path)
+        doc.close()
+        return {"segments": self.paragraphs, "images": self.images}
+
+    def generate(self, output_dir: str, documents: int, formats: List[str]) -> List[Dict]:
+        """
+        Write documents to output_dir, cycling through formats.
+        Returns one manifest entry per document.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        writers = {"txt": self.write_txt, "docx": self.write_docx, "pdf": self.write_pdf}
+        manifest = []
+        for index in range(documents):
+            doc_type = formats[index % len(formats)]
+            path = os.path.join(output_dir, f"doc_{index:04d}.{doc_type}")
+            entry = writers[doc_type](path)
+            entry.update({"path": path, "document_type": doc_type, "size_bytes": os.path.getsize(path)})
+            manifest.append(entry)
+        return manifest
+
+def _peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process in MB.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_benchmark(
+    corpus_dir: str,
+    output_dir: str,
+    documents: int = 30,
+    formats: Optional[List[str]] = None,
+    paragraphs: int = 200,
+    images: int = 4,
+    duplicate_ratio: float = 0.25,
+    pages: int = 10,
+    seed: int = 0,
+    stub: bool = True,
+    concurrent: bool = False,
+    streaming: Optional[bool] = None
+) -> Dict:
+    """
+    Generate a synthetic corpus and filter every document with one
+    DocumentProcessor. Model loading happens before timing starts.
+
+    Returns the benchmark results: throughput, latency percentiles, time
+    per stage, peak RSS and the settings used.
+    """
+    from document_processor import DocumentProcessor
+
+    formats = formats or ["txt", "docx", "pdf"]
+    generator = CorpusGenerator(paragraphs, images, duplicate_ratio, pages, seed=seed)
+    print(f"Generating {documents} documents in {corpus_dir}...")
+    manifest = generator.generate(corpus_dir, documents, formats)
+
+    processor = DocumentProcessor(concurrent=concurrent)
+    if stub:
+        install_stubs(processor)
+    else:
+        processor.warmup(images=images > 0)
+
+    os.makedirs(output_dir, exist_ok=True)
+    latencies = []
+    stages = {}
+    image_counters = {}
+    segments = 0
+    image_count = 0
+    failed = 0
+    start = time.perf_counter()
+    for entry in manifest:
+        output_path = os.path.join(output_dir, os.path.basename(entry["path"]))
+        doc_start = time.perf_counter()
+        try:
+            result = processor.process_document(entry["path"], output_path, streaming=streaming)
+        except Exception as e:
+            print(f"Failed: {entry['path']}: {type(e).__name__}: {str(e)}")
+            failed += 1
+            continue
+        latencies.append(time.perf_counter() - doc_start)
+        segments += entry["segments"]
+        image_count += entry["images"]
+        for stage, seconds in result.get("timings", {}).items():
+            if stage != "total":
+                stages[stage] = stages.get(stage, 0.0) + seconds
+        for name, value in result["image_stats"].items():
+            if name.startswith(("resolved_by_", "unique_", "duplicate_", "cached_")):
+                image_counters[name] = image_counters.get(name, 0) + value
+    elapsed = time.perf_counter() - start
+    processor.close()
+
+    succeeded = len(latencies)
+    return {
+        "settings": {
+            "documents": documents,
+            "formats": formats,
+            "paragraphs": paragraphs,
+            "images": images,
+            "duplicate_ratio": duplicate_ratio,
+            "pages": pages,
+            "seed": seed,
+            "stub": stub,
+            "concurrent": concurrent,
+            "streaming": streaming
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "corpus_digest": hashlib.sha256(
+            json.dumps([(entry["document_type"], entry["size_bytes"]) for entry in manifest]).encode()
+        ).hexdigest()[:16],
+        "documents": len(manifest),
+        "failed": failed,
+        "seconds": elapsed,
+        "docs_per_second": succeeded / elapsed if elapsed > 0 else 0.0,
+        "segments_per_second": segments / elapsed if elapsed > 0 else 0.0,
+        "images_per_second": image_count / elapsed if elapsed > 0 else 0.0,
+        "latency_p50": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "latency_p95": float(np.percentile(latencies, 95)) if latencies else 0.0,
+        "stage_seconds": stages,
+        "image_counters": image_counters,
+        "startup": processor.get_startup_report(),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+# Metrics compared against a previous run, and whether higher is better
+COMPARED_METRICS = {
+    "docs_per_second": True,
+    "segments_per_second": True,
+    "images_per_second": True,
+    "latency_p50": False,
+    "latency_p95": False,
+    "peak_rss_mb": False
+}
+
+def compare_results(current: Dict, previous: Dict) -> Dict[str, Dict]:
+    """
+    Compare the metrics of two benchmark runs.
+    Returns the previous and current value and the relative change of
+    each metric, with 'better' telling whether the change is an improvement.
+    """
+    if current.get("corpus_digest") != previous.get("corpus_digest"):
+        print("Warning: the runs used different corpora, comparison may be misleading")
+
+    comparison = {}
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old, new = previous.get(metric), current.get(metric)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        comparison[metric] = {
+            "previous": old,
+            "current": new,
+            "change": change,
+            "better": change > 0 if higher_is_better else change < 0,
+            "unchanged": change == 0
+        }
+    return comparison
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the content filter on a synthetic corpus")
+    parser.add_argument("--documents", type=int, default=30, help="Number of documents to generate")
+    parser.add_argument("--formats", default="txt,docx,pdf", help="Comma-separated document types")
+    parser.add_argument("--paragraphs", type=int, default=200, help="Text segments per document")
+    parser.add_argument("--images", type=int, default=4, help="Images per .docx/.pdf document")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.25, help="Fraction of repeated images")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per .pdf document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-models", action="store_true", help="Use the real models instead of stubs")
+    parser.add_argument("--concurrent", action="store_true", help="Run the processor in concurrent mode")
+    parser.add_argument("--streaming", action="store_true", help="Stream .txt and .pdf documents")
+    parser.add_argument("--workdir", default="benchmark_data", help="Directory for the corpus and outputs")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        os.path.join(args.workdir, "corpus"),
+        os.path.join(args.workdir, "output"),
+        documents=args.documents,
+        formats=args.formats.split(","),
+        paragraphs=args.paragraphs,
+        images=args.images,
+        duplicate_ratio=args.duplicate_ratio,
+        pages=args.pages,
+        seed=args.seed,
+        stub=not args.real_models,
+        concurrent=args.concurrent,
+        streaming=True if args.streaming else None
+    )
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            results["comparison"] = compare_results(results, json.load(file))
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+
+    print("\nBenchmark complete!")
+    print(f"Documents: {results['documents']} ({results['failed']} failed)")
+    print(f"Throughput: {results['docs_per_second']:.2f} docs/sec, "
+          f"{results['segments_per_second']:.1f} segments/sec, "
+          f"{results['images_per_second']:.1f} images/sec")
+    print(f"Latency: p50 {results['latency_p50'] * 1000:.1f} ms, p95 {results['latency_p95'] * 1000:.1f} ms")
+    if results["peak_rss_mb"] is not None:
+        print(f"Peak RSS: {results['peak_rss_mb']:.1f} MB")
+    for stage, seconds in results["stage_seconds"].items():
+        print(f"{stage}: {seconds:.2f}s")
+    for metric, values in results.get("comparison", {}).items():
+        verdict = "unchanged" if values["unchanged"] else "better" if values["better"] else "worse"
+        print(f"{metric}: {values['previous']:.4g} -> {values['current']:.4g} ({values['change']:+.1%}, {verdict})")
+    print(f"Results written to: {args.output}")
+
+if __name__ == "__main__":
+    main()
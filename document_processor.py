@@ -1,11 +1,22 @@
-from typing import Dict, Tuple, List
+from typing import Callable, Dict, Iterator, Tuple, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image
+import logging
 import os
+import time
 
+from metrics import NULL_METRICS, Metrics
+from segment_manifest import SegmentManifest
+from resources import ALLOW_DOWNLOADS, INFERENCE_BACKEND, QUANTIZE, timed
 from text_filter import TextFilter
-from image_filter import ImageFilter
 from utils import (
     get_document_type,
+    detect_encoding,
+    iter_txt_chunks,
+    iter_pdf_pages,
+    PdfRedactor,
+    PdfWriter,
+    write_txt_lines,
     extract_docx_content,
     extract_pdf_content,
     extract_txt_content,
@@ -14,69 +25,369 @@ from utils import (
     save_txt
 )
 
+logger = logging.getLogger(__name__)
+
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(
+        self,
+        allow_downloads: bool = ALLOW_DOWNLOADS,
+        chunk_lines: int = 2000,
+        stream_threshold_bytes: int = 64 * 1024 * 1024,
+        backend: str = INFERENCE_BACKEND,
+        quantize: bool = QUANTIZE,
+        concurrent: bool = False,
+        metrics: Metrics = NULL_METRICS,
+        incremental: bool = False,
+        pdf_mode: str = 'rebuild',
+        cache_path: Optional[str] = None,
+        cache_max_age: Optional[float] = None,
+        lexicon_path: Optional[str] = None,
+        expand_inflections: bool = False
+    ):
         """
         Initialize the document processor with text and image filters.
+        
+        Filters are created lazily: the text filter on first use and the
+        image filter only when a document actually contains images.
+        
+        Args:
+            allow_downloads: Fetch missing models from the network
+            chunk_lines: Lines per chunk when streaming .txt files
+            stream_threshold_bytes: .txt files larger than this are
+                streamed unless process_document is told otherwise
+            backend: Inference backend for all models, 'pytorch' or 'onnx'
+            quantize: Use int8 quantized models with the 'onnx' backend
+            concurrent: Run extraction, text filtering, image filtering and
+                saving on separate threads so independent stages overlap
+            metrics: Where stage timings, model calls, cache hit rates and
+                errors of the processor and both filters are recorded; a
+                snapshot is written to its sinks after each document
+            incremental: Keep a manifest of segment and image verdicts next
+                to each output, so re-filtering an edited document only
+                runs the models on new or changed content
+            pdf_mode: 'rebuild' writes the filtered content of a PDF into a
+                new document; 'redact' removes flagged text and images from
+                a copy of the original, keeping its layout
+            cache_path: Optional SQLite file that keeps toxicity verdicts
+                across runs and processes
+            cache_max_age: Maximum age in seconds of cached verdicts
+            lexicon_path: Optional lexicon file with one inappropriate word
+                or phrase per line; it is reloaded before a document if it
+                changed on disk
+            expand_inflections: Also match simple inflected variants of
+                single-word lexicon terms
+        
+        Call close() when done so the verdict cache is trimmed and closed.
+        """
+        if pdf_mode not in ('rebuild', 'redact'):
+            raise ValueError(f"Unsupported PDF mode: {pdf_mode}")
+        start = time.perf_counter()
+        self.allow_downloads = allow_downloads
+        self.chunk_lines = chunk_lines
+        self.stream_threshold_bytes = stream_threshold_bytes
+        self.backend = backend
+        self.quantize = quantize
+        self.concurrent = concurrent
+        self.metrics = metrics
+        self.incremental = incremental
+        self.pdf_mode = pdf_mode
+        self.cache_path = cache_path
+        self.cache_max_age = cache_max_age
+        self.lexicon_path = lexicon_path
+        self.expand_inflections = expand_inflections
+        self._executors = {}
+        self.load_times = {}
+        self._text_filter = None
+        self._image_filter = None
+        self.load_times["processor"] = time.perf_counter() - start
+    
+    @property
+    def text_filter(self) -> TextFilter:
+        """
+        Text filter, created on first use.
+        """
+        if self._text_filter is None:
+            logger.info("Initializing text filter...")
+            with timed(self.load_times, "text_filter"):
+                self._text_filter = TextFilter(
+                    allow_downloads=self.allow_downloads,
+                    backend=self.backend,
+                    quantize=self.quantize,
+                    cache_path=self.cache_path,
+                    cache_max_age=self.cache_max_age,
+                    lexicon_path=self.lexicon_path,
+                    expand_inflections=self.expand_inflections,
+                    metrics=self.metrics
+                )
+        return self._text_filter
+    
+    @property
+    def image_filter(self):
+        """
+        Image filter, created on first use so the image stack is only
+        imported for documents that contain images.
+        """
+        if self._image_filter is None:
+            logger.info("Initializing image filter...")
+            with timed(self.load_times, "image_filter"):
+                from image_filter import ImageFilter
+                self._image_filter = ImageFilter(
+                    allow_downloads=self.allow_downloads,
+                    backend=self.backend,
+                    quantize=self.quantize,
+                    metrics=self.metrics
+                )
+        return self._image_filter
+    
+    def warmup(self, images: bool = False):
+        """
+        Load the models ahead of the first document.
+        """
+        self.text_filter.toxicity_classifier
+        if images:
+            self.image_filter.nsfw_classifier
+            self.image_filter.violence_classifier
+    
+    def get_startup_report(self) -> Dict:
+        """
+        Get the time in seconds spent creating each component and loading
+        each model so far. Components that were never needed are absent.
+        """
+        report = dict(self.load_times)
+        for name, component in (("text_filter", self._text_filter), ("image_filter", self._image_filter)):
+            if component is not None:
+                for model, seconds in component.load_times.items():
+                    report[f"{name}.{model}"] = seconds
+        report["total"] = sum(report.values())
+        return report
+    
+    def _load_models(self, texts: List[str], images: List[Image.Image]):
+        """
+        In concurrent mode, load the models a batch needs before its stages
+        are dispatched. Loading a transformers model briefly changes torch's
+        process-wide default device, which breaks inference running on
+        another thread at the same time.
+        """
+        if not self.concurrent:
+            return
+        if texts:
+            self.text_filter.toxicity_classifier
+        if images:
+            self.image_filter.nsfw_classifier
+            self.image_filter.violence_classifier
+    
+    def _executor(self, name: str) -> ThreadPoolExecutor:
+        """
+        Single-thread executor for one pipeline stage, created on first use.
+        'io' runs extraction and saving (PyMuPDF must stay on one thread),
+        'text' and 'image' run the filters.
+        """
+        if name not in self._executors:
+            self._executors[name] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"filter-{name}")
+        return self._executors[name]
+    
+    def _submit(self, executor: str, timings: Dict[str, float], stage: str, fn: Callable, *args) -> Future:
+        """
+        Run fn(*args) as part of a stage, adding its duration to
+        timings[stage]. In concurrent mode it runs on the stage's executor;
+        otherwise it runs right away and the returned future is already done.
         """
-        print("Initializing filters...")
-        self.text_filter = TextFilter()
-        self.image_filter = ImageFilter()
-        print("Filters initialized successfully")
+        def run():
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            except Exception as e:
+                self.metrics.increment("errors_total", stage=stage, error=type(e).__name__)
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                timings[stage] = timings.get(stage, 0.0) + seconds
+                self.metrics.observe("stage_seconds", seconds, stage=stage)
+        
+        if self.concurrent:
+            return self._executor(executor).submit(run)
+        
+        future = Future()
+        try:
+            future.set_result(run())
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
+    def _prefetch(self, items: Iterator, timings: Dict[str, float]) -> Iterator:
+        """
+        Iterate over a page or chunk iterator, extracting the next item on
+        the io executor while the caller filters the current one.
+        """
+        done = object()
+        pending = self._submit("io", timings, "extract", next, items, done)
+        while True:
+            item = pending.result()
+            if item is done:
+                return
+            pending = self._submit("io", timings, "extract", next, items, done)
+            yield item
     
-    def process_document(self, input_path: str, output_path: str) -> Dict:
+    def close(self):
+        """
+        Shut down the stage executors used in concurrent mode and close
+        the text filter's verdict cache.
+        """
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._executors = {}
+        if self._text_filter is not None:
+            self._text_filter.close()
+    
+    def process_document(
+        self,
+        input_path: str,
+        output_path: str,
+        streaming: Optional[bool] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        manifest_path: Optional[str] = None
+    ) -> Dict:
         """
         Process a document and filter inappropriate content.
         
         Args:
             input_path: Path to the input document
             output_path: Path where the filtered document should be saved
+            streaming: Process .txt files chunk by chunk and PDFs page by
+                page with bounded memory; None streams files larger than
+                stream_threshold_bytes, and every PDF in concurrent mode so
+                extracting a page overlaps filtering the previous one
+            progress: Optional callback called as progress(done, total)
+                after each streamed or redacted PDF page
+            manifest_path: Segment manifest to reuse and update; defaults to
+                output_path + '.manifest.json' in incremental mode. Giving
+                a path enables incremental filtering for this call
             
         Returns:
-            Dictionary containing statistics about the filtering process
+            Dictionary containing statistics about the filtering process,
+            including the seconds spent in each stage under 'timings', the
+            verdict cache counters under 'toxicity_cache' and, when
+            filtering incrementally, reuse counts under 'incremental'
         """
+        start = time.perf_counter()
+        timings = {"extract": 0.0, "text_filter": 0.0, "image_filter": 0.0, "save": 0.0}
+        
         # Validate input file
-        print(f"Validating input file: {input_path}")
+        logger.info("Validating input file: %s", input_path)
         if not os.path.exists(input_path):
             raise FileNotFoundError(f"Input file not found: {input_path}")
         
         # Get document type
-        print("Determining document type...")
+        logger.info("Determining document type...")
         doc_type = get_document_type(input_path)
-        print(f"Document type: {doc_type}")
+        logger.info("Document type: %s", doc_type)
+        
+        if streaming is None:
+            streaming = os.path.getsize(input_path) > self.stream_threshold_bytes
+            # Paged formats are pipelined page by page in concurrent mode
+            streaming = streaming or (self.concurrent and doc_type == 'pdf')
+        if self._text_filter is not None and self._text_filter.reload_lexicon_if_changed():
+            logger.info("Reloaded lexicon: %s", self.lexicon_path)
+        manifest = None
+        if manifest_path is not None or self.incremental:
+            manifest = SegmentManifest(
+                manifest_path or output_path + '.manifest.json',
+                (lambda: self.image_filter.get_signature()) if doc_type != 'txt' else ""
+            )
+            if manifest.load():
+                logger.info("Reusing verdicts from manifest: %s", manifest.path)
         
+        status = "error"
+        try:
+            if doc_type == 'pdf' and self.pdf_mode == 'redact':
+                result = self._process_pdf_redact(input_path, output_path, timings, progress, manifest)
+            elif streaming and doc_type == 'txt':
+                result = self._process_txt_stream(input_path, output_path, timings, manifest)
+            elif streaming and doc_type == 'pdf':
+                result = self._process_pdf_stream(input_path, output_path, timings, progress, manifest)
+            else:
+                result = self._process_whole(input_path, output_path, doc_type, timings, manifest)
+            if manifest is not None:
+                manifest.save()
+                result["incremental"] = manifest.get_stats()
+                logger.info("Reused %s segments and %s images", manifest.reused_segments, manifest.reused_images)
+            status = "ok"
+        finally:
+            self.metrics.increment("documents_total", document_type=doc_type, status=status)
+            self.metrics.flush()
+        
+        timings["total"] = time.perf_counter() - start
+        result["timings"] = timings
+        if self._text_filter is not None:
+            result["toxicity_cache"] = self._text_filter.toxicity_cache.get_stats()
+        return result
+    
+    def _filter_images(
+        self,
+        images: List[Image.Image],
+        counters: Dict,
+        manifest: Optional[SegmentManifest] = None
+    ) -> Tuple[List[Image.Image], List[bool], List[str]]:
+        """
+        Filter images, without loading the image filter if there are none.
+        """
+        if not images:
+            return [], [], []
+        return self.image_filter.filter_images(images, counters, manifest)
+    
+    def _process_whole(
+        self,
+        input_path: str,
+        output_path: str,
+        doc_type: str,
+        timings: Dict[str, float],
+        manifest: Optional[SegmentManifest] = None
+    ) -> Dict:
+        """
+        Filter a document that is loaded into memory at once. In concurrent
+        mode text and image filtering run in parallel.
+        """
         # Extract content based on document type
-        print("Extracting document content...")
-        texts, images = self._extract_content(input_path, doc_type)
-        print(f"Extracted {len(texts)} text segments and {len(images)} images")
-        
-        # Filter text content
-        print("Filtering text content...")
-        filtered_texts = self.text_filter.filter_texts(texts)
-        text_stats = self.text_filter.get_content_stats(texts)
-        print(f"Text filtering complete. Stats: {text_stats}")
-        
-        # Filter images
-        print("Filtering images...")
-        filtered_images, image_flags, image_categories = self.image_filter.filter_images(images)
-        image_stats = self.image_filter.get_image_stats(image_flags, image_categories)
-        print("Image filtering complete.")
-        print(f"Total images: {image_stats['total_images']}")
-        print(f"Flagged images: {image_stats['flagged_images']}")
+        logger.info("Extracting document content...")
+        texts, images = self._submit(
+            "io", timings, "extract", self._extract_content, input_path, doc_type
+        ).result()
+        logger.info("Extracted %s text segments and %s images", len(texts), len(images))
+        
+        logger.info("Filtering text content and images...")
+        image_counters = {}
+        self._load_models(texts, images)
+        text_job = self._submit("text", timings, "text_filter", self.text_filter.analyze_texts, texts, manifest)
+        image_job = self._submit("image", timings, "image_filter", self._filter_images, images, image_counters, manifest)
+        records = text_job.result()
+        filtered_images, image_flags, image_categories = image_job.result()
+        filtered_texts = [record["filtered"] for record in records]
+        text_stats = self.text_filter.get_record_stats(records)
+        logger.info("Text filtering complete. Stats: %s", text_stats)
+        
+        if images:
+            image_stats = self.image_filter.get_image_stats(image_flags, image_categories)
+            image_stats.update(image_counters)
+        else:
+            image_stats = self._empty_image_stats()
+        logger.info("Image filtering complete.")
+        logger.info("Total images: %s", image_stats['total_images'])
+        logger.info("Flagged images: %s", image_stats['flagged_images'])
+        if image_stats.get('duplicate_images'):
+            logger.info("Duplicate images: %s", image_stats['duplicate_images'])
         if image_stats['categories']:
-            print("Removed by category:")
+            logger.info("Removed by category:")
             for category, count in image_stats['categories'].items():
-                print(f"- {category}: {count}")
+                logger.info("- %s: %s", category, count)
         
         # Save filtered content
-        print(f"Saving filtered content to: {output_path}")
-        self._save_filtered_content(
-            output_path,
-            doc_type,
-            filtered_texts,
-            filtered_images
-        )
-        print("Content saved successfully")
+        logger.info("Saving filtered content to: %s", output_path)
+        removed_spans = [self.text_filter.removed_spans(record) for record in records]
+        self._submit(
+            "io", timings, "save", self._save_filtered_content,
+            output_path, doc_type, filtered_texts, filtered_images, input_path, removed_spans
+        ).result()
+        logger.info("Content saved successfully")
         
         # Combine and return statistics
         return {
@@ -87,6 +398,210 @@ class DocumentProcessor:
             "document_type": doc_type
         }
     
+    def _process_txt_stream(
+        self,
+        input_path: str,
+        output_path: str,
+        timings: Dict[str, float],
+        manifest: Optional[SegmentManifest] = None
+    ) -> Dict:
+        """
+        Filter a .txt file chunk by chunk, appending each filtered chunk to
+        the output as it goes. Peak memory is bounded by a few chunks; in
+        concurrent mode reading the next chunk and writing the previous one
+        overlap with filtering the current one.
+        """
+        encoding = detect_encoding(input_path)
+        logger.info("Streaming text content (%s) in chunks of %s lines...", encoding, self.chunk_lines)
+        
+        text_stats = self.text_filter.merge_stats([])
+        lines = 0
+        with open(output_path, 'w', encoding='utf-8') as output_file:
+            writes = []
+            chunks = iter_txt_chunks(input_path, self.chunk_lines, encoding)
+            for chunk in self._prefetch(chunks, timings):
+                filtered_texts, chunk_stats = self._submit(
+                    "text", timings, "text_filter", self.text_filter.filter_and_stats, chunk, manifest
+                ).result()
+                writes.append(self._submit("io", timings, "save", write_txt_lines, output_file, filtered_texts))
+                text_stats = self.text_filter.merge_stats([text_stats, chunk_stats])
+                lines += len(chunk)
+                logger.info("Processed %s lines", lines)
+            for write in writes:
+                write.result()
+        
+        logger.info("Text filtering complete. Stats: %s", text_stats)
+        logger.info("Content saved successfully")
+        
+        return {
+            "text_stats": text_stats,
+            "image_stats": self._empty_image_stats(),
+            "input_file": input_path,
+            "output_file": output_path,
+            "document_type": 'txt'
+        }
+    
+    def _process_pdf_stream(
+        self,
+        input_path: str,
+        output_path: str,
+        timings: Dict[str, float],
+        progress: Optional[Callable[[int, int], None]] = None,
+        manifest: Optional[SegmentManifest] = None
+    ) -> Dict:
+        """
+        Filter a PDF one page at a time: each page is extracted, filtered
+        and written before later pages are loaded, so memory is bounded by
+        a few pages rather than the whole document. In concurrent mode
+        page N+1 is extracted while page N is filtered, its text and images
+        are filtered in parallel, and page N is written while page N+1 is
+        filtered.
+        """
+        logger.info("Streaming PDF content page by page...")
+        writer = PdfWriter(output_path)
+        text_stats = self.text_filter.merge_stats([])
+        image_flags = []
+        image_categories = []
+        image_counters = {}
+        writes = []
+        
+        for page_num, page_count, texts, images in self._prefetch(iter_pdf_pages(input_path), timings):
+            self._load_models(texts, images)
+            text_job = self._submit("text", timings, "text_filter", self.text_filter.filter_and_stats, texts, manifest)
+            image_job = self._submit("image", timings, "image_filter", self._filter_images, images, image_counters, manifest)
+            filtered_texts, page_stats = text_job.result()
+            filtered_images, flags, categories = image_job.result()
+            text_stats = self.text_filter.merge_stats([text_stats, page_stats])
+            image_flags.extend(flags)
+            image_categories.extend(categories)
+            
+            # Writes run in page order on the io executor
+            writes.append(self._submit("io", timings, "save", writer.add_texts, filtered_texts))
+            if filtered_images:
+                writes.append(self._submit("io", timings, "save", writer.add_images, filtered_images))
+            
+            logger.info("Processed page %s/%s", page_num + 1, page_count)
+            if progress is not None:
+                progress(page_num + 1, page_count)
+        
+        for write in writes:
+            write.result()
+        self._submit("io", timings, "save", writer.close).result()
+        
+        if image_flags:
+            image_stats = self.image_filter.get_image_stats(image_flags, image_categories)
+            image_stats.update(image_counters)
+        else:
+            image_stats = self._empty_image_stats()
+        logger.info("Text filtering complete. Stats: %s", text_stats)
+        logger.info("Flagged images: %s", image_stats['flagged_images'])
+        logger.info("Content saved successfully")
+        
+        return {
+            "text_stats": text_stats,
+            "image_stats": image_stats,
+            "input_file": input_path,
+            "output_file": output_path,
+            "document_type": 'pdf'
+        }
+    
+    def _process_pdf_redact(
+        self,
+        input_path: str,
+        output_path: str,
+        timings: Dict[str, float],
+        progress: Optional[Callable[[int, int], None]] = None,
+        manifest: Optional[SegmentManifest] = None
+    ) -> Dict:
+        """
+        Filter a PDF in place, one page at a time: text blocks and images
+        are filtered as usual, then toxic blocks, inappropriate words and
+        flagged images are redacted on a copy of the source document.
+        Pages without removals are left as they are. All PyMuPDF work runs
+        on the io executor.
+        """
+        logger.info("Redacting PDF content page by page...")
+        redactor = self._submit("io", timings, "extract", PdfRedactor, input_path).result()
+        text_stats = self.text_filter.merge_stats([])
+        image_flags = []
+        image_categories = []
+        image_counters = {}
+        redactions = []
+        
+        try:
+            for page_num, page_count, blocks, images in self._prefetch(redactor.pages(), timings):
+                texts = [text for _, text in blocks]
+                page_images = [image for _, image in images]
+                self._load_models(texts, page_images)
+                text_job = self._submit("text", timings, "text_filter", self.text_filter.analyze_texts, texts, manifest)
+                image_job = self._submit("image", timings, "image_filter", self._filter_images, page_images, image_counters, manifest)
+                records = text_job.result()
+                _, flags, categories = image_job.result()
+                text_stats = self.text_filter.merge_stats([text_stats, self.text_filter.get_record_stats(records)])
+                image_flags.extend(flags)
+                image_categories.extend(categories)
+                
+                # Valid blocks that were removed entirely, or only in part
+                block_rects = []
+                span_removals = []
+                for (rect, _), record in zip(blocks, records):
+                    if not record["valid"]:
+                        continue
+                    if record["filtered"] == '\n':
+                        block_rects.append(rect)
+                    else:
+                        spans = self.text_filter.removed_spans(record)
+                        if spans:
+                            span_removals.append((rect, record["text"], spans))
+                xrefs = [xref for (xref, _), flagged in zip(images, flags) if flagged]
+                
+                if block_rects or span_removals or xrefs:
+                    redactions.append(self._submit(
+                        "io", timings, "save", redactor.redact_page, page_num, block_rects, span_removals, xrefs
+                    ))
+                
+                logger.info("Processed page %s/%s", page_num + 1, page_count)
+                if progress is not None:
+                    progress(page_num + 1, page_count)
+            
+            for redaction in redactions:
+                redaction.result()
+        except Exception:
+            # Leave no partially redacted output behind
+            self._submit("io", timings, "save", redactor.doc.close).result()
+            raise
+        self._submit("io", timings, "save", redactor.save, output_path).result()
+        
+        if image_flags:
+            image_stats = self.image_filter.get_image_stats(image_flags, image_categories)
+            image_stats.update(image_counters)
+        else:
+            image_stats = self._empty_image_stats()
+        logger.info("Text filtering complete. Stats: %s", text_stats)
+        logger.info("Flagged images: %s", image_stats['flagged_images'])
+        logger.info("Redacted %s text areas and %s images", redactor.redacted_areas, len(redactor.deleted_xrefs))
+        logger.info("Content saved successfully")
+        
+        return {
+            "text_stats": text_stats,
+            "image_stats": image_stats,
+            "input_file": input_path,
+            "output_file": output_path,
+            "document_type": 'pdf'
+        }
+    
+    def _empty_image_stats(self) -> Dict:
+        """
+        Image statistics for a document without images, computed without
+        loading the image filter.
+        """
+        return {
+            "total_images": 0,
+            "flagged_images": 0,
+            "clean_ratio": 1.0,
+            "categories": {}
+        }
+    
     def _extract_content(
         self,
         file_path: str,
@@ -109,14 +624,19 @@ class DocumentProcessor:
         output_path: str,
         doc_type: str,
         texts: List[str],
-        images: List[Image.Image]
+        images: List[Image.Image],
+        source_path: Optional[str] = None,
+        removed_spans: Optional[List[List[Tuple[int, int]]]] = None
     ):
         """
-        Save the filtered content to a new document.
+        Save the filtered content to a new document. For .docx files with
+        a source_path, the source package is rewritten instead, keeping
+        its tables, headers, styles and media; removed_spans, the spans
+        the lexicon removed from each text, locate the words to cut.
         """
         try:
             if doc_type == 'docx':
-                save_docx(texts, images, output_path)
+                save_docx(texts, images, output_path, source_path, removed_spans)
             elif doc_type == 'pdf':
                 save_pdf(texts, images, output_path)
             elif doc_type == 'txt':
@@ -124,11 +644,12 @@ class DocumentProcessor:
             else:
                 raise ValueError(f"Unsupported document type for saving: {doc_type}")
         except Exception as e:
-            print(f"Error saving filtered content: {str(e)}")
+            logger.error("Error saving filtered content: %s", e)
             raise
 
 if __name__ == "__main__":
     # Example usage
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     processor = DocumentProcessor()
     
     # Process a document
@@ -0,0 +1,514 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+import argparse
+import asyncio
+import base64
+import functools
+import io
+import json
+import logging
+import os
+import time
+
+from document_processor import DocumentProcessor
+from metrics import Metrics, PrometheusSink
+from utils import get_document_type
+
+logger = logging.getLogger(__name__)
+
+class ServiceBusyError(Exception):
+    """
+    Raised when a batcher queue stays full for longer than the enqueue timeout.
+    """
+
+class MicroBatcher:
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        max_queue_size: int = 1024,
+        enqueue_timeout: float = 5.0
+    ):
+        """
+        Initialize a batcher that groups items from concurrent requests.
+
+        Args:
+            process_batch: Blocking function mapping a list of items to a
+                list of results in the same order; runs on a dedicated thread
+            max_batch_size: Maximum number of items per call to process_batch
+            max_wait_ms: How long to wait for more items once a batch has started
+            max_queue_size: Maximum number of queued items before submitters block
+            enqueue_timeout: Seconds a submitter may block on a full queue
+                before ServiceBusyError is raised
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout
+        self.queue = asyncio.Queue(maxsize=max_queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.items = 0
+        self._worker = None
+
+    def start(self):
+        """
+        Start the background task that drains the queue.
+        """
+        if self._worker is None:
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        Stop the background task and release the model thread.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self.executor.shutdown(wait=False)
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        """
+        Queue items for batched processing and wait for their results.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for item in items:
+            future = loop.create_future()
+            try:
+                await asyncio.wait_for(self.queue.put((item, future)), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                raise ServiceBusyError("Filter queue is full, retry later")
+            futures.append(future)
+        return list(await asyncio.gather(*futures))
+
+    async def _next_batch(self) -> List[Tuple[Any, asyncio.Future]]:
+        """
+        Wait for one item, then collect more until the batch is full or
+        max_wait has passed.
+        """
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        """
+        Drain the queue batch by batch, resolving each item's future.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def get_stats(self) -> dict:
+        """
+        Get queue depth and batching counters.
+        """
+        return {
+            "queued": self.queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches > 0 else 0.0
+        }
+
+class FilterService:
+    def __init__(
+        self,
+        processor: Optional[DocumentProcessor] = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+        max_queue_size: int = 1024,
+        lexicon_check_seconds: float = 5.0
+    ):
+        """
+        Initialize the service around a long-lived DocumentProcessor.
+        Text segments and images from concurrent requests share batchers.
+        Metrics are always collected and served at GET /metrics. The
+        lexicon file is checked for changes at most every
+        lexicon_check_seconds and reloaded without a restart.
+        """
+        self.processor = processor or DocumentProcessor(metrics=Metrics())
+        self.prometheus = PrometheusSink()
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+        self.lexicon_check_seconds = lexicon_check_seconds
+        self._lexicon_checked = time.monotonic()
+        self.text_batcher = None
+        self.image_batcher = None
+        # Extraction and saving stay on one thread, since PyMuPDF must not
+        # be used from several threads at once; record preparation runs on
+        # a separate pool
+        self.io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-io")
+        self.cpu_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="service-cpu")
+
+    def _score_texts(self, texts: List[str]) -> List[List[dict]]:
+        return self.processor.text_filter.score_toxicity(texts)
+
+    def _classify_images(self, images: List[Image.Image]) -> List[Tuple[bool, str]]:
+        _, flags, categories = self.processor.image_filter.filter_images(images)
+        return list(zip(flags, categories))
+
+    async def start(self):
+        """
+        Start the batchers and load the models.
+        """
+        self.text_batcher = MicroBatcher(
+            self._score_texts, self.max_batch_size, self.max_wait_ms, self.max_queue_size
+        )
+        self.image_batcher = MicroBatcher(
+            self._classify_images, self.max_batch_size, self.max_wait_ms, self.max_queue_size
+        )
+        self.text_batcher.start()
+        self.image_batcher.start()
+
+        # Load all models before accepting requests: the two batchers run
+        # inference on separate threads, and loading a model while the
+        # other thread runs inference is not safe
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.io_executor, self.processor.warmup, True)
+
+    async def stop(self):
+        """
+        Stop the batchers and close the processor's verdict cache.
+        """
+        await self.text_batcher.stop()
+        await self.image_batcher.stop()
+        self.io_executor.shutdown(wait=False)
+        self.cpu_executor.shutdown(wait=False)
+        self.processor.close()
+
+    async def _reload_lexicon_if_due(self):
+        """
+        Pick up edits to the lexicon file, checking at most every
+        lexicon_check_seconds.
+        """
+        now = time.monotonic()
+        if now - self._lexicon_checked < self.lexicon_check_seconds:
+            return
+        self._lexicon_checked = now
+        loop = asyncio.get_running_loop()
+        text_filter = self.processor.text_filter
+        if await loop.run_in_executor(self.cpu_executor, text_filter.reload_lexicon_if_changed):
+            logger.info("Reloaded lexicon: %s", text_filter.lexicon.path)
+
+    async def _timed(self, timings: Dict[str, float], stage: str, awaitable):
+        """
+        Await a stage, adding its duration to timings[stage].
+        """
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+    async def _filter_records(self, texts: List[str]) -> List[dict]:
+        """
+        Analyze text segments, scoring them through the shared text batcher.
+        """
+        loop = asyncio.get_running_loop()
+        text_filter = self.processor.text_filter
+        records = await loop.run_in_executor(self.cpu_executor, text_filter.prepare_records, texts)
+        candidates = [record for record in records if record["valid"]]
+        scores = await self.text_batcher.submit_many([record["text"] for record in candidates])
+        await loop.run_in_executor(self.cpu_executor, text_filter.complete_records, candidates, scores)
+        return records
+
+    async def filter_content(
+        self,
+        texts: List[str],
+        images: List[Image.Image],
+        timings: Optional[Dict[str, float]] = None
+    ) -> Dict:
+        """
+        Filter text segments and images through the shared batchers.
+        Returns filtered texts with the character spans the lexicon removed
+        from each, image verdicts and statistics. If a timings
+        dict is given, the seconds spent on text and images are added to it.
+        """
+        await self._reload_lexicon_if_due()
+        timings = {} if timings is None else timings
+        text_filter = self.processor.text_filter
+
+        # Text and image items are queued concurrently
+        records, verdicts = await asyncio.gather(
+            self._timed(timings, "text_filter", self._filter_records(texts)),
+            self._timed(timings, "image_filter", self.image_batcher.submit_many(images))
+        )
+
+        flags = [flag for flag, _ in verdicts]
+        categories = [category for _, category in verdicts]
+        if images:
+            image_stats = self.processor.image_filter.get_image_stats(flags, categories)
+        else:
+            image_stats = self.processor._empty_image_stats()
+
+        return {
+            "filtered_texts": [record["filtered"] for record in records],
+            "removed_spans": [text_filter.removed_spans(record) for record in records],
+            "image_flags": flags,
+            "image_categories": categories,
+            "text_stats": text_filter.get_record_stats(records),
+            "image_stats": image_stats
+        }
+
+    def _needs_processor(
+        self,
+        input_path: str,
+        doc_type: str,
+        streaming: Optional[bool],
+        manifest_path: Optional[str]
+    ) -> bool:
+        """
+        Check whether a document needs a mode the batched path does not
+        implement: PDF redaction, streaming or incremental filtering.
+        """
+        processor = self.processor
+        if processor.incremental or manifest_path is not None:
+            return True
+        if doc_type == 'pdf' and processor.pdf_mode == 'redact':
+            return True
+        if doc_type == 'docx':
+            return False
+        if streaming is None:
+            streaming = os.path.getsize(input_path) > processor.stream_threshold_bytes
+        return streaming
+
+    async def process_document(
+        self,
+        input_path: str,
+        output_path: str,
+        streaming: Optional[bool] = None,
+        manifest_path: Optional[str] = None
+    ) -> Dict:
+        """
+        Process a document on disk like DocumentProcessor.process_document,
+        but with model work going through the shared batchers.
+
+        Documents that need PDF redaction, streaming or incremental
+        filtering are handed to the processor itself on the io thread, so
+        they honour its settings; their models are not batched with other
+        requests.
+        """
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input file not found: {input_path}")
+
+        loop = asyncio.get_running_loop()
+        doc_type = get_document_type(input_path)
+        if self._needs_processor(input_path, doc_type, streaming, manifest_path):
+            return await loop.run_in_executor(
+                self.io_executor,
+                functools.partial(
+                    self.processor.process_document,
+                    input_path,
+                    output_path,
+                    streaming=streaming,
+                    manifest_path=manifest_path
+                )
+            )
+
+        start = time.perf_counter()
+        timings = {"extract": 0.0, "text_filter": 0.0, "image_filter": 0.0, "save": 0.0}
+        texts, images = await self._timed(timings, "extract", loop.run_in_executor(
+            self.io_executor, self.processor._extract_content, input_path, doc_type
+        ))
+
+        result = await self.filter_content(texts, images, timings)
+        filtered_images = [
+            image for image, flag in zip(images, result["image_flags"]) if not flag
+        ]
+        await self._timed(timings, "save", loop.run_in_executor(
+            self.io_executor,
+            self.processor._save_filtered_content,
+            output_path,
+            doc_type,
+            result["filtered_texts"],
+            filtered_images,
+            input_path,
+            result["removed_spans"]
+        ))
+        timings["total"] = time.perf_counter() - start
+
+        return {
+            "text_stats": result["text_stats"],
+            "image_stats": result["image_stats"],
+            "input_file": input_path,
+            "output_file": output_path,
+            "document_type": doc_type,
+            "timings": timings
+        }
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        """
+        Route a request to its handler. Returns (status, response), where
+        the response is a JSON-serializable dict or plain text.
+        """
+        if method == "GET" and path == "/health":
+            return 200, {
+                "status": "ok",
+                "text_batcher": self.text_batcher.get_stats(),
+                "image_batcher": self.image_batcher.get_stats(),
+                "toxicity_cache": self.processor.text_filter.toxicity_cache.get_stats()
+            }
+
+        if method == "GET" and path == "/metrics":
+            return 200, self.prometheus.render(self.processor.metrics.snapshot())
+        
+        if method != "POST" or path not in ("/filter", "/process"):
+            return 404, {"error": f"Unknown endpoint: {method} {path}"}
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "Request body must be JSON"}
+
+        if path == "/filter":
+            images = [
+                Image.open(io.BytesIO(base64.b64decode(data)))
+                for data in payload.get("images", [])
+            ]
+            return 200, await self.filter_content(payload.get("texts", []), images)
+
+        if "input_path" not in payload or "output_path" not in payload:
+            return 400, {"error": "input_path and output_path are required"}
+        return 200, await self.process_document(
+            payload["input_path"],
+            payload["output_path"],
+            streaming=payload.get("streaming"),
+            manifest_path=payload.get("manifest_path")
+        )
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serve one HTTP/1.1 request per connection.
+        """
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                status, response = 400, {"error": "Malformed request"}
+            else:
+                method, path = request_line[0], request_line[1]
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                try:
+                    status, response = await self._dispatch(method, path, body)
+                except ServiceBusyError as e:
+                    status, response = 503, {"error": str(e)}
+                except (FileNotFoundError, ValueError) as e:
+                    status, response = 400, {"error": str(e)}
+                except Exception as e:
+                    logger.exception("Error handling %s %s", method, path)
+                    self.processor.metrics.increment("errors_total", stage="service", error=type(e).__name__)
+                    status, response = 500, {"error": f"{type(e).__name__}: {str(e)}"}
+
+            if isinstance(response, str):
+                data = response.encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            else:
+                data = json.dumps(response).encode("utf-8")
+                content_type = "application/json"
+            reasons = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                       500: "Internal Server Error", 503: "Service Unavailable"}
+            writer.write(
+                f"HTTP/1.1 {status} {reasons[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + data
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, unix_socket: Optional[str] = None):
+        """
+        Start the batchers and serve requests until cancelled.
+        """
+        await self.start()
+        if unix_socket:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            logger.info("Filter service listening on unix socket %s", unix_socket)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            logger.info("Filter service listening on http://%s:%s", host, port)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the content filter as a local service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    parser.add_argument("--max-queue-size", type=int, default=1024)
+    parser.add_argument("--cache-path", help="SQLite file that keeps toxicity verdicts across restarts")
+    parser.add_argument("--cache-max-age", type=float, default=None, help="Maximum age in seconds of cached verdicts")
+    parser.add_argument("--lexicon", help="Lexicon file with one inappropriate word or phrase per line; edits are picked up live")
+    parser.add_argument("--expand-inflections", action="store_true", help="Also match inflected variants of lexicon words")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    processor = DocumentProcessor(
+        metrics=Metrics(),
+        cache_path=args.cache_path,
+        cache_max_age=args.cache_max_age,
+        lexicon_path=args.lexicon,
+        expand_inflections=args.expand_inflections
+    )
+    service = FilterService(
+        processor,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue_size=args.max_queue_size
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        logger.info("Filter service stopped")
+
+if __name__ == "__main__":
+    main()
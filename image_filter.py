@@ -1,28 +1,92 @@
-from typing import List, Tuple
-import tensorflow as tf
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import io
+import logging
 import numpy as np
 from PIL import Image
 import cv2
-from transformers import pipeline
+
+from inference_backend import load_image_classifier
+from metrics import NULL_METRICS, Metrics
+from resources import ALLOW_DOWNLOADS, INFERENCE_BACKEND, QUANTIZE, timed
+
+logger = logging.getLogger(__name__)
+
+# Cascade stages whose verdicts come from the models; only these are
+# remembered and shared between occurrences of an image
+MODEL_STAGES = ('nsfw_model', 'early_exit', 'violence_model')
 
 class ImageFilter:
-    def __init__(self):
+    def __init__(
+        self,
+        allow_downloads: bool = ALLOW_DOWNLOADS,
+        dedupe: str = 'content',
+        verdict_cache_size: int = 10000,
+        batch_size: int = 16,
+        min_image_size: int = 32,
+        min_entropy: float = 0.5,
+        input_size: int = 256,
+        safe_exit_threshold: Optional[float] = None,
+        backend: str = INFERENCE_BACKEND,
+        quantize: bool = QUANTIZE,
+        metrics: Metrics = NULL_METRICS
+    ):
         """
         Initialize the image filter with required models.
+        
+        Args:
+            allow_downloads: Fetch missing models from the network instead
+                of failing
+            dedupe: How repeated images are recognized so each is classified
+                once: 'content' (exact pixel/byte hash), 'phash' (perceptual
+                hash plus size class, also catches re-encoded copies but may
+                share a verdict between similar looking images) or 'none'
+            verdict_cache_size: Number of image verdicts remembered across
+                calls, so images repeated across documents are classified once
+            batch_size: Number of images per classifier forward pass
+            min_image_size: Images with a side shorter than this (icons,
+                spacers) are passed without running the models; 0 disables
+            min_entropy: Images whose grayscale entropy in bits is below
+                this (solid fills, rules) are passed without running the
+                models; 0 disables
+            input_size: Shortest edge each image is resized down to once,
+                keeping its aspect ratio (smaller images are not upscaled);
+                the pixel buffer is shared by both models, which crop or
+                resize it as their processors do, and the blood check.
+                Should be at least the largest
+                resize any model needs, 256 for ResNet-50's 224 crop
+            safe_exit_threshold: If set, images the NSFW model labels as
+                'normal' or 'neutral' with at least this confidence skip the
+                violence classifier
+            backend: Inference backend for both models, 'pytorch' or 'onnx'
+            quantize: Use int8 quantized models with the 'onnx' backend
+            metrics: Where stage timings, model calls, verdict cache hits
+                and errors are recorded; disabled by default
+        
+        Models are loaded on first use from the local cache.
         """
-        # Load NSFW detection model from transformers
-        self.nsfw_classifier = pipeline(
-            "image-classification",
-            model="Falconsai/nsfw_image_detection",
-            top_k=5
-        )
+        if dedupe not in ('phash', 'content', 'none'):
+            raise ValueError(f"Unsupported dedupe mode: {dedupe}")
+        self.allow_downloads = allow_downloads
+        self.dedupe = dedupe
+        self.verdict_cache_size = verdict_cache_size
+        self.batch_size = batch_size
+        self.min_image_size = min_image_size
+        self.min_entropy = min_entropy
+        self.input_size = input_size
+        self.safe_exit_threshold = safe_exit_threshold
+        self.backend = backend
+        self.quantize = quantize
+        self.metrics = metrics
+        self._verdict_cache = OrderedDict()
+        self.nsfw_model_id = "Falconsai/nsfw_image_detection"
+        self.violence_model_id = "microsoft/resnet-50"
         
-        # Load violence detection model
-        self.violence_classifier = pipeline(
-            "image-classification",
-            model="microsoft/resnet-50",
-            top_k=5
-        )
+        # Time spent loading each component, for startup reports
+        self.load_times = {}
+        self._nsfw_classifier = None
+        self._violence_classifier = None
         
         # Initialize detection thresholds
         self.nsfw_threshold = 0.7
@@ -35,83 +99,162 @@ class ImageFilter:
             'Offensive': ['hate_symbol', 'offensive_gesture']
         }
     
-    def _preprocess_image(self, image: Image.Image) -> Image.Image:
+    @property
+    def nsfw_classifier(self):
+        """
+        NSFW detection model, loaded on first use.
+        """
+        if self._nsfw_classifier is None:
+            with timed(self.load_times, "nsfw_classifier"):
+                self._nsfw_classifier = load_image_classifier(
+                    self.nsfw_model_id,
+                    top_k=5,
+                    backend=self.backend,
+                    quantize=self.quantize,
+                    allow_downloads=self.allow_downloads
+                )
+        return self._nsfw_classifier
+    
+    @property
+    def violence_classifier(self):
+        """
+        Violence detection model, loaded on first use.
+        """
+        if self._violence_classifier is None:
+            with timed(self.load_times, "violence_classifier"):
+                self._violence_classifier = load_image_classifier(
+                    self.violence_model_id,
+                    top_k=5,
+                    backend=self.backend,
+                    quantize=self.quantize,
+                    allow_downloads=self.allow_downloads
+                )
+        return self._violence_classifier
+    
+    def _decode(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """
+        Get an image to analyze at about the given size.
+        
+        Extracted images are decoded from their encoded bytes into a
+        separate image, so the extracted one never holds decoded pixels.
+        JPEGs are decoded in draft mode, which scales them down by up to
+        8x inside the decoder while staying at least as large as size.
+        """
+        encoded = image.info.get('encoded_bytes')
+        if encoded is None:
+            return image
+        decoded = Image.open(io.BytesIO(encoded))
+        decoded.draft('RGB', size)
+        return decoded
+    
+    def _preprocess_image(self, image: Image.Image) -> np.ndarray:
         """
         Preprocess image for model input.
+        
+        The image is decoded and resized once, keeping its aspect ratio,
+        so its shortest edge is at most input_size, and returned as an
+        HxWx3 uint8 RGB buffer that both classifiers (which crop or resize
+        it like their processors) and the blood check read without
+        further copies.
         """
+        width, height = image.size
+        scale = min(1.0, self.input_size / max(1, min(width, height)))
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        image = self._decode(image, size)
+        
+        # Resize before converting so the conversion touches fewer pixels;
+        # palette and unusual modes are converted first to resize smoothly
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGB')
+        if image.size != size:
+            image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        
         # Convert to RGB if needed
-        if image.mode not in ('RGB', 'L'):
+        if image.mode != 'RGB':
             image = image.convert('RGB')
         
-        # Resize image while maintaining aspect ratio
-        max_size = 800
-        ratio = min(max_size/image.size[0], max_size/image.size[1])
-        new_size = tuple([int(dim * ratio) for dim in image.size])
-        image = image.resize(new_size, Image.Resampling.LANCZOS)
+        return np.asarray(image)
+    
+    def _nsfw_verdict(self, predictions: List[dict]) -> Tuple[bool, str]:
+        """
+        Turn NSFW classifier predictions for one image into a verdict.
+        Returns (is_inappropriate, category).
+        """
+        for pred in predictions:
+            label = pred['label'].lower()
+            score = pred['score']
+            
+            # If it's porn or hentai with high confidence, definitely inappropriate
+            if label in ['porn', 'hentai'] and score > self.nsfw_threshold:
+                return True, f"NSFW: {label}"
+            
+            # If it's sexy content with high confidence, also inappropriate
+            if label == 'sexy' and score > self.nsfw_threshold:
+                return True, f"NSFW: {label}"
+        
+        return False, ""
+    
+    def _violence_verdict(self, predictions: List[dict]) -> Tuple[bool, str]:
+        """
+        Turn violence classifier predictions for one image into a verdict.
+        Returns (is_inappropriate, category).
+        """
+        for pred in predictions:
+            label = pred['label'].lower()
+            score = pred['score']
+            
+            if any(category in label for category in ['weapon', 'knife', 'gun', 'blood', 'injury']) and score > self.violence_threshold:
+                return True, f"Violence: {label}"
         
-        return image
+        return False, ""
+    
+    def _red_ratio(self, pixels: np.ndarray) -> float:
+        """
+        Fraction of an RGB buffer covered by blood-like red.
+        """
+        # Check for blood (red color detection)
+        hsv = cv2.cvtColor(pixels, cv2.COLOR_RGB2HSV)
+        lower_red = np.array([0, 120, 70])
+        upper_red = np.array([10, 255, 255])
+        red_mask = cv2.inRange(hsv, lower_red, upper_red)
+        return np.count_nonzero(red_mask) / red_mask.size
+    
+    def _has_blood(self, pixels: np.ndarray) -> bool:
+        """
+        Check for large red areas that might be blood.
+        """
+        # If significant red areas detected, might be blood
+        return self._red_ratio(pixels) > 0.2  # If more than 20% is red
     
-    def _check_nsfw_content(self, image: Image.Image) -> Tuple[bool, str]:
+    def _check_nsfw_content(self, pixels: np.ndarray) -> Tuple[bool, str]:
         """
         Check if image contains NSFW content.
         Returns (is_inappropriate, category).
         """
         try:
             # Get predictions
-            predictions = self.nsfw_classifier(image)
-            
-            # Check predictions
-            for pred in predictions:
-                label = pred['label'].lower()
-                score = pred['score']
-                
-                # If it's porn or hentai with high confidence, definitely inappropriate
-                if label in ['porn', 'hentai'] and score > self.nsfw_threshold:
-                    return True, f"NSFW: {label}"
-                
-                # If it's sexy content with high confidence, also inappropriate
-                if label == 'sexy' and score > self.nsfw_threshold:
-                    return True, f"NSFW: {label}"
-            
-            return False, ""
+            predictions = self.nsfw_classifier(pixels)
+            return self._nsfw_verdict(predictions)
             
         except Exception as e:
-            print(f"Warning: Error in NSFW detection: {str(e)}")
+            self._record_error("nsfw", e)
             return True, "Error in processing"  # Err on the side of caution
     
-    def _check_violence_content(self, image: Image.Image) -> Tuple[bool, str]:
+    def _check_violence_content(self, pixels: np.ndarray) -> Tuple[bool, str]:
         """
         Check if image contains violent content.
         Returns (is_inappropriate, category).
         """
         try:
-            # Convert image to numpy array for OpenCV processing
-            img_np = np.array(image)
-            
-            # Check for blood (red color detection)
-            hsv = cv2.cvtColor(img_np, cv2.COLOR_RGB2HSV)
-            lower_red = np.array([0, 120, 70])
-            upper_red = np.array([10, 255, 255])
-            red_mask = cv2.inRange(hsv, lower_red, upper_red)
-            
-            # If significant red areas detected, might be blood
-            red_ratio = np.sum(red_mask > 0) / (image.size[0] * image.size[1])
-            if red_ratio > 0.2:  # If more than 20% is red
+            if self._has_blood(pixels):
                 return True, "Violence: Blood detected"
             
             # Use violence classifier
-            predictions = self.violence_classifier(image)
-            for pred in predictions:
-                label = pred['label'].lower()
-                score = pred['score']
-                
-                if any(category in label for category in ['weapon', 'knife', 'gun', 'blood', 'injury']) and score > self.violence_threshold:
-                    return True, f"Violence: {label}"
-            
-            return False, ""
+            predictions = self.violence_classifier(pixels)
+            return self._violence_verdict(predictions)
             
         except Exception as e:
-            print(f"Warning: Error in violence detection: {str(e)}")
+            self._record_error("violence", e)
             return False, ""  # Don't flag if violence check fails
     
     def _is_inappropriate(self, image: Image.Image) -> Tuple[bool, str]:
@@ -136,7 +279,7 @@ class ImageFilter:
             return False, ""
             
         except Exception as e:
-            print(f"Warning: Error processing image: {str(e)}")
+            self._record_error("preprocess", e)
             return True, "Error in processing"  # Err on the side of caution
     
     def filter_image(self, image: Image.Image) -> Tuple[Image.Image, bool, str]:
@@ -148,31 +291,344 @@ class ImageFilter:
             was_inappropriate, category = self._is_inappropriate(image)
             
             if was_inappropriate:
-                print(f"Removed inappropriate image: {category}")
+                logger.info("Removed inappropriate image: %s", category)
                 return None, True, category
             
             return image, False, ""
             
         except Exception as e:
-            print(f"Warning: Error filtering image: {str(e)}")
+            self._record_error("filter", e)
             return None, True, "Error in processing"
     
-    def filter_images(self, images: List[Image.Image]) -> Tuple[List[Image.Image], List[bool], List[str]]:
+    def _record_error(self, stage: str, error: Exception, message: str = "Error in image check"):
+        """
+        Log a recovered error and count it by stage and exception type.
+        """
+        logger.warning("%s (%s): %s", message, stage, error)
+        self.metrics.increment("errors_total", stage=stage, error=type(error).__name__)
+    
+    def _run_batch(self, classifier, buffers: List[np.ndarray], model: str) -> List[List[dict]]:
+        """
+        Run an image classifier over a list of pixel buffers in batches of
+        self.batch_size.
+        """
+        predictions = []
+        with self.metrics.timer("stage_seconds", stage=model):
+            for start in range(0, len(buffers), self.batch_size):
+                batch = buffers[start:start + self.batch_size]
+                predictions.extend(classifier(batch, batch_size=len(batch)))
+                self.metrics.increment("model_calls_total", model=model)
+                self.metrics.observe("batch_size", len(batch), model=model)
+        return predictions
+    
+    def _entropy(self, pixels: np.ndarray) -> float:
+        """
+        Shannon entropy in bits of the grayscale histogram of an RGB buffer.
+        """
+        gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+        histogram = np.bincount(gray.ravel(), minlength=256)
+        probabilities = histogram[histogram > 0] / gray.size
+        return float(-np.sum(probabilities * np.log2(probabilities)))
+    
+    def _is_confidently_safe(self, predictions: List[dict]) -> bool:
+        """
+        Check whether NSFW predictions allow skipping the violence stage.
+        """
+        if self.safe_exit_threshold is None:
+            return False
+        return any(
+            pred['label'].lower() in ('normal', 'neutral') and pred['score'] >= self.safe_exit_threshold
+            for pred in predictions
+        )
+    
+    def _classify_images(
+        self,
+        images: List[Image.Image],
+        counters: Optional[Dict[str, int]] = None,
+        stages: Optional[List[str]] = None
+    ) -> List[Tuple[bool, str]]:
+        """
+        Classify a list of images with a cheap-first cascade and batched
+        model calls. Returns one (is_inappropriate, category) verdict per image.
+        
+        Each image is resized once to the models' input resolution; every
+        stage below reads that same pixel buffer.
+        
+        Stages, each resolving some images before the next one runs:
+        1. size/entropy rules pass trivial images (icons, spacers, solid fills)
+        2. the NSFW classifier runs over the remaining images as one batch,
+           optionally passing confidently safe images (safe_exit_threshold)
+        3. a red-area check flags likely blood
+        4. the violence classifier runs over what is left as a second batch
+        
+        If a batched call fails, the affected images fall back to the
+        per-image checks so one bad image cannot fail the whole batch.
+        If a counters dict is given, the number of images resolved by each
+        stage is added to it as resolved_by_<stage>. If a stages list is
+        given, it is filled with the stage that resolved each image.
+        """
+        resolved = {}
+        verdicts = [None] * len(images)
+        resolved_by = [None] * len(images)
+        processed = {}
+        
+        def resolve(index, verdict, stage):
+            verdicts[index] = verdict
+            resolved_by[index] = stage
+            resolved[stage] = resolved.get(stage, 0) + 1
+        
+        # Stage 1: cheap rules, checking the size before paying for a resize
+        with self.metrics.timer("stage_seconds", stage="preprocess"):
+            for index, image in enumerate(images):
+                try:
+                    if min(image.size) < self.min_image_size:
+                        resolve(index, (False, ""), "size")
+                        continue
+                    pixels = self._preprocess_image(image)
+                    if self.min_entropy > 0 and self._entropy(pixels) < self.min_entropy:
+                        resolve(index, (False, ""), "entropy")
+                        continue
+                    processed[index] = pixels
+                except Exception as e:
+                    self._record_error("preprocess", e)
+                    resolve(index, (True, "Error in processing"), "error")  # Err on the side of caution
+        
+        # Stage 2: NSFW detection over the whole batch; the model is only
+        # loaded once an image needs it
+        pending = list(processed)
+        predictions = []
+        nsfw_verdicts = []
+        if pending:
+            try:
+                predictions = self._run_batch(self.nsfw_classifier, [processed[i] for i in pending], "nsfw")
+                nsfw_verdicts = [self._nsfw_verdict(pred) for pred in predictions]
+            except Exception as e:
+                self._record_error("nsfw", e, "Batched detection failed, checking images one by one")
+                predictions = [[] for _ in pending]
+                nsfw_verdicts = [self._check_nsfw_content(processed[i]) for i in pending]
+        
+        survivors = []
+        for index, verdict, pred in zip(pending, nsfw_verdicts, predictions):
+            if verdict[0]:
+                resolve(index, verdict, "nsfw_model")
+            elif self._is_confidently_safe(pred):
+                resolve(index, verdict, "early_exit")
+            else:
+                survivors.append(index)
+        
+        # Stage 3: blood heuristic
+        candidates = []
+        for index in survivors:
+            try:
+                if self._has_blood(processed[index]):
+                    resolve(index, (True, "Violence: Blood detected"), "red_ratio")
+                    continue
+            except Exception as e:
+                self._record_error("red_ratio", e)
+                resolve(index, (False, ""), "error")  # Don't flag if violence check fails
+                continue
+            candidates.append(index)
+        
+        # Stage 4: violence classifier on what is left
+        violence_verdicts = []
+        if candidates:
+            try:
+                predictions = self._run_batch(self.violence_classifier, [processed[i] for i in candidates], "violence")
+                violence_verdicts = [self._violence_verdict(pred) for pred in predictions]
+            except Exception as e:
+                self._record_error("violence", e, "Batched detection failed, checking images one by one")
+                violence_verdicts = [self._check_violence_content(processed[i]) for i in candidates]
+        
+        for index, verdict in zip(candidates, violence_verdicts):
+            resolve(index, verdict, "violence_model")
+        
+        if counters is not None:
+            for stage, count in resolved.items():
+                key = f"resolved_by_{stage}"
+                counters[key] = counters.get(key, 0) + count
+        
+        if stages is not None:
+            stages[:] = resolved_by
+        
+        for verdict in verdicts:
+            if verdict[0]:
+                logger.info("Removed inappropriate image: %s", verdict[1])
+        return verdicts
+    
+    def _content_hash(self, image: Image.Image) -> str:
+        """
+        Exact content hash of an image: the hash of its encoded bytes when
+        extraction recorded one, otherwise a hash of its pixels.
+        """
+        content_hash = image.info.get('content_hash')
+        if content_hash is None:
+            digest = hashlib.sha256(f"{image.mode}{image.size}".encode('utf-8'))
+            digest.update(image.tobytes())
+            content_hash = digest.hexdigest()
+        return content_hash
+    
+    def _perceptual_hash(self, image: Image.Image) -> str:
+        """
+        64-bit difference hash: compares neighbouring pixels of a 9x8
+        grayscale thumbnail, so re-encoded copies of the same picture hash
+        alike. The size class (power of two of each side) is part of the
+        key, so a thumbnail never shares a verdict with a full-size image.
+        """
+        small = self._decode(image, (9, 8)).convert('L').resize((9, 8), Image.Resampling.BILINEAR)
+        pixels = np.asarray(small, dtype=np.int16)
+        bits = pixels[:, 1:] > pixels[:, :-1]
+        width, height = image.size
+        return f"dhash:{np.packbits(bits).tobytes().hex()}:{width.bit_length()}x{height.bit_length()}"
+    
+    def _image_keys(self, images: List[Image.Image]) -> List[Optional[str]]:
+        """
+        Compute the dedupe key of each image; None when dedupe is disabled
+        or the image cannot be hashed, so it is classified on its own.
+        Images shared by several occurrences are only hashed once.
+        """
+        if self.dedupe == 'none':
+            return [None] * len(images)
+        
+        keys_by_id = {}
+        keys = []
+        for image in images:
+            if id(image) in keys_by_id:
+                keys.append(keys_by_id[id(image)])
+                continue
+            try:
+                if self.dedupe == 'content':
+                    key = self._content_hash(image)
+                else:
+                    key = self._perceptual_hash(image)
+            except Exception as e:
+                self._record_error("dedupe", e, "Error hashing image")
+                key = None
+            keys_by_id[id(image)] = key
+            keys.append(key)
+        return keys
+    
+    def _remember_verdict(self, key: str, verdict: Tuple[bool, str]):
+        """
+        Store a verdict in the cross-call LRU cache.
+        """
+        self._verdict_cache[key] = verdict
+        self._verdict_cache.move_to_end(key)
+        while len(self._verdict_cache) > self.verdict_cache_size:
+            self._verdict_cache.popitem(last=False)
+    
+    def get_signature(self) -> str:
+        """
+        Identify everything an image verdict depends on, so stored verdicts
+        are not reused after the models or settings change.
+        """
+        return "|".join(str(part) for part in (
+            self.nsfw_model_id, self.violence_model_id, self.nsfw_threshold,
+            self.violence_threshold, self.dedupe, self.min_image_size,
+            self.min_entropy, self.input_size, self.safe_exit_threshold, self.backend,
+            self.quantize
+        ))
+    
+    def filter_images(
+        self,
+        images: List[Image.Image],
+        counters: Optional[Dict[str, int]] = None,
+        manifest=None
+    ) -> Tuple[List[Image.Image], List[bool], List[str]]:
         """
         Filter a list of images by removing inappropriate ones.
         Returns (filtered_images, flags, categories).
+        
+        Repeated images are classified once and the verdict is fanned out to
+        every occurrence. Only verdicts that came from the models are cached
+        or stored. With 'phash' dedupe, where images sharing a key may still
+        differ, they are also the only ones fanned out: an image passed or
+        flagged by the size, entropy or blood rules, or whose check failed,
+        is evaluated on its own. If a counters dict is given, the number of
+        unique images (distinct dedupe keys), of duplicates (further
+        occurrences of a key), of keys served from the verdict cache or
+        manifest and of images resolved by each cascade stage are added to
+        it. With a SegmentManifest, images unchanged since the previous run
+        reuse their stored verdicts and new verdicts are recorded in it.
         """
+        keys = self._image_keys(images)
+        verdicts = {}
+        cached = 0
+        
+        # Collect the unique images that still need classification
+        to_classify = []
+        for image, key in zip(images, keys):
+            verdict_key = key if key is not None else id(image)
+            if verdict_key in verdicts:
+                continue
+            
+            stored = manifest.lookup_image(key) if manifest is not None and key is not None else None
+            if stored is not None:
+                verdicts[key] = stored
+                cached += 1
+                continue
+            
+            if key is not None and key in self._verdict_cache:
+                self._verdict_cache.move_to_end(key)
+                verdicts[key] = self._verdict_cache[key]
+                cached += 1
+                continue
+            
+            verdicts[verdict_key] = None
+            to_classify.append((verdict_key, image))
+        
+        self.metrics.increment("cache_requests_total", cached, cache="image_verdict", result="hit")
+        self.metrics.increment("cache_requests_total", len(to_classify), cache="image_verdict", result="miss")
+        
+        stages = []
+        results = self._classify_images([image for _, image in to_classify], counters, stages)
+        # Verdicts from the cheap rules or errors are not remembered (errors
+        # are retried next time); with phash they belong to one image object
+        rule_owners = {}
+        for (verdict_key, image), verdict, stage in zip(to_classify, results, stages):
+            verdicts[verdict_key] = verdict
+            if stage not in MODEL_STAGES or verdict[1] == "Error in processing":
+                rule_owners[verdict_key] = id(image)
+            elif isinstance(verdict_key, str):
+                self._remember_verdict(verdict_key, verdict)
+        
+        # Other occurrences of a rule-resolved phash key are evaluated on
+        # their own; content keys only match byte-identical images
+        own_verdicts = {}
+        if self.dedupe == 'phash':
+            for image, key in zip(images, keys):
+                owner = rule_owners.get(key)
+                if owner is not None and owner != id(image):
+                    own_verdicts[id(image)] = image
+        if own_verdicts:
+            own_images = list(own_verdicts.values())
+            for image, verdict in zip(own_images, self._classify_images(own_images, counters)):
+                own_verdicts[id(image)] = verdict
+        
+        if manifest is not None:
+            for verdict_key, verdict in verdicts.items():
+                if isinstance(verdict_key, str) and verdict_key not in rule_owners:
+                    manifest.add_image(verdict_key, verdict)
+        
         filtered_images = []
         flags = []
         categories = []
         
-        for image in images:
-            filtered_image, was_flagged, category = self.filter_image(image)
-            if filtered_image is not None:
-                filtered_images.append(filtered_image)
+        for image, key in zip(images, keys):
+            if id(image) in own_verdicts:
+                was_flagged, category = own_verdicts[id(image)]
+            else:
+                was_flagged, category = verdicts[key if key is not None else id(image)]
+            if not was_flagged:
+                filtered_images.append(image)
             flags.append(was_flagged)
             categories.append(category)
         
+        if counters is not None:
+            unique = len(verdicts)
+            counters["unique_images"] = counters.get("unique_images", 0) + unique
+            counters["duplicate_images"] = counters.get("duplicate_images", 0) + len(images) - unique
+            counters["cached_verdicts"] = counters.get("cached_verdicts", 0) + cached
+        
         return filtered_images, flags, categories
     
     def get_image_stats(self, flags: List[bool], categories: List[str]) -> dict:
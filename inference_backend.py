@@ -0,0 +1,466 @@
+from typing import Dict, List, Optional, Tuple, Union
+import argparse
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+from resources import ALLOW_DOWNLOADS, CACHE_DIR, INFERENCE_BACKEND, QUANTIZE, load_pipeline, resolve_model
+
+logger = logging.getLogger(__name__)
+
+ONNX_DIR = os.path.join(CACHE_DIR, "onnx")
+
+# Held while any model loads, so filters on different threads load one at a time
+_LOAD_LOCK = threading.Lock()
+
+def _onnx_paths(model_id: str) -> Dict[str, str]:
+    """
+    Locations of the exported and quantized ONNX files for a model.
+    """
+    directory = os.path.join(ONNX_DIR, model_id.replace("/", "--"))
+    return {
+        "dir": directory,
+        "fp32": os.path.join(directory, "model.onnx"),
+        "int8": os.path.join(directory, "model.int8.onnx")
+    }
+
+def _export(model, args: tuple, path: str, input_names: List[str], dynamic_axes: Dict):
+    """
+    Export the logits of a transformers model to ONNX with the
+    TorchScript-based exporter.
+    """
+    import torch
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, *inputs):
+            return self.wrapped(**dict(zip(input_names, inputs))).logits
+
+    model = LogitsOnly(model)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    kwargs = dict(
+        input_names=input_names,
+        output_names=["logits"],
+        dynamic_axes=dynamic_axes,
+        opset_version=17
+    )
+    try:
+        torch.onnx.export(model, args, path, dynamo=False, **kwargs)
+    except TypeError:
+        # Older torch versions have no dynamo switch
+        torch.onnx.export(model, args, path, **kwargs)
+
+def _onnx_session(model_id: str, export_fn, quantize: bool):
+    """
+    Create an ONNX Runtime session for a model, exporting (and quantizing)
+    it into the local ONNX cache the first time.
+    """
+    import onnxruntime
+
+    paths = _onnx_paths(model_id)
+    if not os.path.exists(paths["fp32"]):
+        logger.info("Exporting %s to ONNX...", model_id)
+        export_fn(paths["fp32"])
+
+    path = paths["fp32"]
+    if quantize:
+        if not os.path.exists(paths["int8"]):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            logger.info("Quantizing %s to int8...", model_id)
+            quantize_dynamic(paths["fp32"], paths["int8"], weight_type=QuantType.QInt8)
+        path = paths["int8"]
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+class TextClassifier:
+    def __init__(self, model_path: str, session, max_length: int = 512):
+        """
+        Text classifier running an ONNX Runtime session.
+        Mirrors a text-classification pipeline with return_all_scores=True.
+        """
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        config = AutoConfig.from_pretrained(model_path)
+        self.labels = config.id2label
+        # Same score function the pipeline picks for this model
+        self.multi_label = (
+            config.problem_type == "multi_label_classification" or config.num_labels == 1
+        )
+        self.session = session
+        self.input_names = [node.name for node in session.get_inputs()]
+        self.max_length = max_length
+
+    def __call__(
+        self,
+        texts: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        truncation: bool = True
+    ) -> List[List[dict]]:
+        """
+        Score one text or a list of texts; longer texts are always
+        truncated to max_length.
+        Returns a list with all label scores for each text.
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return []
+
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_length,
+            return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        logits = self.session.run(["logits"], feeds)[0]
+
+        if self.multi_label:
+            scores = 1.0 / (1.0 + np.exp(-logits))
+        else:
+            shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            scores = shifted / shifted.sum(axis=-1, keepdims=True)
+
+        return [
+            [{"label": self.labels[i], "score": float(row[i])} for i in range(len(row))]
+            for row in scores
+        ]
+
+class ImageClassifier:
+    def __init__(self, model_path: str, top_k: int = 5, session_factory=None):
+        """
+        Image classification model that is fed pre-resized RGB pixel
+        buffers instead of PIL images, so one buffer can be shared between
+        several models. Runs the PyTorch model, or the ONNX Runtime session
+        returned by session_factory(input_size) if one is given.
+        """
+        from transformers import AutoConfig, AutoImageProcessor
+
+        processor = AutoImageProcessor.from_pretrained(model_path)
+        self.labels = AutoConfig.from_pretrained(model_path).id2label
+        self.top_k = top_k
+
+        # Processors that resize then center-crop keep only crop_pct of the
+        # shortest edge; others (e.g. ViT) resize the whole image, and then
+        # crop_pct is None so nothing is left out of the check
+        crop_size = getattr(processor, 'crop_size', None) if getattr(processor, 'do_center_crop', False) else None
+        self.crop_pct = getattr(processor, 'crop_pct', None)
+        if not self.crop_pct and crop_size:
+            resized = processor.size.get('shortest_edge') or processor.size.get('height')
+            self.crop_pct = min(1.0, crop_size['height'] / resized)
+        size = crop_size or processor.size
+        self.input_size = size.get('height') or size.get('shortest_edge')
+        # Shortest edge a buffer needs so the model input is never upscaled
+        self.shortest_edge = int(np.ceil(self.input_size / (self.crop_pct or 1.0)))
+
+        self.session = None
+        self.model = None
+        if session_factory is not None:
+            self.session = session_factory(self.input_size)
+        else:
+            import torch
+            from transformers import AutoModelForImageClassification
+            self.torch = torch
+            self.model = AutoModelForImageClassification.from_pretrained(model_path).eval()
+
+        # Fold the processor's rescaling and normalization into one multiply-add
+        rescale = getattr(processor, 'rescale_factor', 1 / 255)
+        mean = np.array(getattr(processor, 'image_mean', None) or [0.5] * 3, dtype=np.float32)
+        std = np.array(getattr(processor, 'image_std', None) or [0.5] * 3, dtype=np.float32)
+        self._scale = (rescale / std).reshape(1, 3, 1, 1)
+        self._shift = (-mean / std).reshape(1, 3, 1, 1)
+
+    def _fit(self, buffer: np.ndarray) -> np.ndarray:
+        """
+        Adapt a shared buffer of any aspect ratio to this model the way its
+        processor would: center-crop a square of crop_pct of its shortest
+        edge if the processor crops, otherwise keep the whole image, and
+        resize to the model input only if the resolution differs. Buffers
+        with a shortest edge of at least shortest_edge are only ever scaled
+        down; smaller images are scaled up to the model input.
+        """
+        # Imported here so text-only runs never load OpenCV
+        import cv2
+
+        if self.crop_pct:
+            height, width = buffer.shape[:2]
+            side = max(1, int(min(height, width) * self.crop_pct))
+            top, left = (height - side) // 2, (width - side) // 2
+            buffer = buffer[top:top + side, left:left + side]
+
+        height, width = buffer.shape[:2]
+        if (height, width) != (self.input_size, self.input_size):
+            shrinking = min(height, width) > self.input_size
+            interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+            buffer = cv2.resize(buffer, (self.input_size, self.input_size), interpolation=interpolation)
+        return buffer
+
+    def logits(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run the model on a normalized NCHW float32 batch.
+        """
+        if self.session is not None:
+            return self.session.run(["logits"], {"pixel_values": batch})[0]
+        with self.torch.no_grad():
+            return self.model(pixel_values=self.torch.from_numpy(batch)).logits.numpy()
+
+    def __call__(self, pixels, batch_size: Optional[int] = None):
+        """
+        Classify one HxWx3 uint8 buffer or a list of them.
+        Like an image-classification pipeline, returns the top_k
+        {'label', 'score'} dicts for one image, or a list of those per image.
+        """
+        single = isinstance(pixels, np.ndarray) and pixels.ndim == 3
+        buffers = [pixels] if single else list(pixels)
+        if not buffers:
+            return []
+
+        buffers = [self._fit(buffer) for buffer in buffers]
+        batch = np.stack(buffers).transpose(0, 3, 1, 2).astype(np.float32)
+        batch = batch * self._scale + self._shift
+
+        logits = self.logits(batch)
+        shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        probabilities = shifted / shifted.sum(axis=-1, keepdims=True)
+
+        results = []
+        for row in probabilities:
+            top = np.argsort(row)[::-1][:self.top_k]
+            results.append([{'label': self.labels[int(i)], 'score': float(row[i])} for i in top])
+        return results[0] if single else results
+
+def _export_text_model(model_path: str, path: str):
+    """
+    Export a sequence classification model with dynamic batch and length.
+    """
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path).eval()
+    sample = tokenizer(["an example sentence"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    _export(model, tuple(sample[name] for name in input_names), path, input_names, dynamic_axes)
+
+def _export_image_model(model_path: str, path: str, input_size: int):
+    """
+    Export an image classification model with a dynamic batch size.
+    """
+    import torch
+    from transformers import AutoModelForImageClassification
+
+    model = AutoModelForImageClassification.from_pretrained(model_path).eval()
+    sample = torch.zeros(1, 3, input_size, input_size)
+    _export(
+        model,
+        (sample,),
+        path,
+        ["pixel_values"],
+        {"pixel_values": {0: "batch"}, "logits": {0: "batch"}}
+    )
+
+def load_text_classifier(
+    model_id: str,
+    backend: str = INFERENCE_BACKEND,
+    quantize: bool = QUANTIZE,
+    allow_downloads: bool = ALLOW_DOWNLOADS
+):
+    """
+    Load a toxicity-style text classifier on the requested backend.
+    Falls back to the PyTorch pipeline if the ONNX backend is unavailable.
+    Loading is serialized, as transformers model loading is not thread-safe.
+    """
+    with _LOAD_LOCK:
+        model_path = resolve_model(model_id, allow_downloads)
+        if backend == "onnx":
+            try:
+                session = _onnx_session(
+                    model_id, lambda path: _export_text_model(model_path, path), quantize
+                )
+                return TextClassifier(model_path, session)
+            except Exception as e:
+                logger.warning("ONNX backend unavailable for %s, using PyTorch: %s", model_id, e)
+        elif backend != "pytorch":
+            raise ValueError(f"Unsupported inference backend: {backend}")
+
+        return load_pipeline(
+            "text-classification", model_id, allow_downloads=allow_downloads, return_all_scores=True
+        )
+
+def load_image_classifier(
+    model_id: str,
+    top_k: int = 5,
+    backend: str = INFERENCE_BACKEND,
+    quantize: bool = QUANTIZE,
+    allow_downloads: bool = ALLOW_DOWNLOADS
+) -> ImageClassifier:
+    """
+    Load an image classifier on the requested backend.
+    Falls back to PyTorch if the ONNX backend is unavailable.
+    Loading is serialized, as transformers model loading is not thread-safe.
+    """
+    with _LOAD_LOCK:
+        model_path = resolve_model(model_id, allow_downloads)
+        if backend == "onnx":
+            try:
+                return ImageClassifier(
+                    model_path,
+                    top_k,
+                    session_factory=lambda input_size: _onnx_session(
+                        model_id,
+                        lambda path: _export_image_model(model_path, path, input_size),
+                        quantize
+                    )
+                )
+            except Exception as e:
+                logger.warning("ONNX backend unavailable for %s, using PyTorch: %s", model_id, e)
+        elif backend != "pytorch":
+            raise ValueError(f"Unsupported inference backend: {backend}")
+
+        return ImageClassifier(model_path, top_k)
+
+# Reference inputs for the parity check
+REFERENCE_TEXTS = [
+    "This is a sample document to test the content filter.",
+    "Some normal text here that should pass through without any issues.",
+    "You are an idiot and I hate you.",
+    "Thank you for your help with the report yesterday.",
+    "Shut up, nobody cares about your stupid opinion.",
+    "The meeting has been moved to Thursday afternoon.",
+    "I will find you and hurt you.",
+    "What a wonderful day for a walk in the park."
+]
+
+def _reference_images(count: int = 8, size: int = 256) -> List[np.ndarray]:
+    """
+    Deterministic synthetic RGB buffers: noise, gradients and flat colors,
+    in landscape 4:3 so the models' center crop is exercised.
+    """
+    random = np.random.RandomState(0)
+    width = size * 4 // 3
+    images = []
+    for index in range(count):
+        if index % 3 == 0:
+            image = random.randint(0, 256, (size, width, 3))
+        elif index % 3 == 1:
+            ramp_x, ramp_y = np.linspace(0, 255, width), np.linspace(255, 0, size)
+            image = np.stack(list(np.meshgrid(ramp_x, ramp_y)) + [np.full((size, width), 40 * index)], axis=-1)
+        else:
+            image = np.full((size, width, 3), random.randint(0, 256, 3))
+        images.append(image.astype(np.uint8))
+    return images
+
+def _compare_top1(expected: List[List[dict]], actual: List[List[dict]]) -> Tuple[int, float]:
+    """
+    Count the images whose top-1 label agrees and find the largest
+    difference in the score of the expected top-1 label.
+    """
+    max_diff = 0.0
+    agreed = 0
+    for expected_top, actual_top in zip(expected, actual):
+        actual_by_label = {result["label"]: result["score"] for result in actual_top}
+        max_diff = max(max_diff, abs(expected_top[0]["score"] - actual_by_label.get(expected_top[0]["label"], 0.0)))
+        agreed += expected_top[0]["label"] == actual_top[0]["label"]
+    return agreed, max_diff
+
+def check_parity(
+    text_model_id: str = "unitary/toxic-bert",
+    image_model_ids: Optional[List[str]] = None,
+    quantize: bool = True,
+    tolerance: float = 0.05,
+    texts: Optional[List[str]] = None,
+    images: Optional[List[np.ndarray]] = None,
+    toxicity_threshold: float = 0.7,
+    allow_downloads: bool = ALLOW_DOWNLOADS
+) -> Dict:
+    """
+    Compare the ONNX backend (optionally int8) against the fp32 PyTorch
+    models on a reference set. Parity holds if every model actually ran on
+    ONNX Runtime, every verdict agrees (toxic above toxicity_threshold for
+    text, top-1 label for images) and no score differs by more than tolerance.
+    Image models fed through ImageClassifier are also compared with the
+    original transformers pipeline on the same non-square images, so
+    preprocessing that differs from the model's own processor (e.g.
+    cropping for a model that resizes the whole image) is caught.
+    """
+    from PIL import Image
+
+    texts = texts or REFERENCE_TEXTS
+    images = images if images is not None else _reference_images()
+    image_model_ids = image_model_ids or ["Falconsai/nsfw_image_detection", "microsoft/resnet-50"]
+    report = {"quantize": quantize, "tolerance": tolerance, "models": {}}
+
+    reference = load_text_classifier(text_model_id, "pytorch", allow_downloads=allow_downloads)
+    candidate = load_text_classifier(text_model_id, "onnx", quantize, allow_downloads)
+    expected = reference(texts, batch_size=len(texts))
+    actual = candidate(texts, batch_size=len(texts))
+    max_diff = 0.0
+    agreed = 0
+    for expected_scores, actual_scores in zip(expected, actual):
+        expected_by_label = {result["label"]: result["score"] for result in expected_scores}
+        actual_by_label = {result["label"]: result["score"] for result in actual_scores}
+        max_diff = max(max_diff, max(
+            abs(expected_by_label[label] - actual_by_label[label]) for label in expected_by_label
+        ))
+        toxic = [scores.get("toxic", 0.0) > toxicity_threshold for scores in (expected_by_label, actual_by_label)]
+        agreed += toxic[0] == toxic[1]
+    report["models"][text_model_id] = {
+        "onnx": isinstance(candidate, TextClassifier),
+        "samples": len(texts), "verdicts_agree": agreed, "max_score_diff": max_diff
+    }
+
+    for model_id in image_model_ids:
+        with _LOAD_LOCK:
+            pipeline = load_pipeline("image-classification", model_id, allow_downloads=allow_downloads, top_k=5)
+        reference = load_image_classifier(model_id, backend="pytorch", allow_downloads=allow_downloads)
+        candidate = load_image_classifier(model_id, backend="onnx", quantize=quantize, allow_downloads=allow_downloads)
+        original = pipeline([Image.fromarray(image) for image in images])
+        expected = reference(images)
+        actual = candidate(images)
+        pipeline_agreed, pipeline_diff = _compare_top1(original, expected)
+        agreed, max_diff = _compare_top1(expected, actual)
+        report["models"][model_id] = {
+            "onnx": candidate.session is not None,
+            "samples": len(images), "verdicts_agree": agreed, "max_score_diff": max_diff,
+            "pipeline_verdicts_agree": pipeline_agreed, "pipeline_max_score_diff": pipeline_diff
+        }
+
+    report["passed"] = all(
+        result["onnx"]
+        and result["verdicts_agree"] == result["samples"] and result["max_score_diff"] <= tolerance
+        and result.get("pipeline_verdicts_agree", result["samples"]) == result["samples"]
+        and result.get("pipeline_max_score_diff", 0.0) <= tolerance
+        for result in report["models"].values()
+    )
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ONNX backend parity with the PyTorch models")
+    parser.add_argument("--no-quantize", action="store_true", help="Compare fp32 ONNX instead of int8")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Maximum allowed score difference")
+    parser.add_argument("--texts", help="File with one reference text per line")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    texts = None
+    if args.texts:
+        with open(args.texts, 'r', encoding='utf-8') as file:
+            texts = [line.strip() for line in file if line.strip()]
+
+    report = check_parity(quantize=not args.no_quantize, tolerance=args.tolerance, texts=texts)
+    print(json.dumps(report, indent=2))
+    if not report["passed"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
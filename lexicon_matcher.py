@@ -0,0 +1,196 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import deque
+import os
+import re
+
+# Words (keeping internal apostrophes and hyphens) or single punctuation marks
+TOKEN_PATTERN = re.compile(r"\w+(?:['’-]\w+)*|[^\w\s]")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into word and punctuation tokens in a single regex scan.
+    """
+    return TOKEN_PATTERN.findall(text)
+
+def token_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Character (start, end) offsets of the tokens tokenize returns.
+    """
+    return [match.span() for match in TOKEN_PATTERN.finditer(text)]
+
+class _Automaton:
+    def __init__(self, phrases: Iterable[Tuple[str, ...]]):
+        """
+        Build an Aho-Corasick automaton over token sequences.
+        Each phrase is a tuple of lowercased tokens.
+        """
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]
+        self.phrase_count = 0
+
+        own_lengths: List[set] = [set()]
+        for phrase in phrases:
+            if not phrase:
+                continue
+            state = 0
+            for token in phrase:
+                next_state = self.goto[state].get(token)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][token] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    own_lengths.append(set())
+                state = next_state
+            if len(phrase) not in own_lengths[state]:
+                own_lengths[state].add(len(phrase))
+                self.phrase_count += 1
+
+        # Breadth-first pass to set failure links and merge outputs
+        self.output = [tuple(lengths) for lengths in own_lengths]
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and token not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(token, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                inherited = self.output[self.fail[next_state]]
+                if inherited:
+                    self.output[next_state] = tuple(set(self.output[next_state]) | set(inherited))
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int]]:
+        """
+        Find all phrase occurrences in a token list.
+        Returns (start, end) token index spans.
+        """
+        spans = []
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for index, token in enumerate(tokens):
+            token = token.lower()
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            for length in output[state]:
+                spans.append((index - length + 1, index + 1))
+        return spans
+
+class LexiconMatcher:
+    def __init__(
+        self,
+        terms: Optional[Iterable[str]] = None,
+        path: Optional[str] = None,
+        expand_inflections: bool = False
+    ):
+        """
+        Initialize a compiled matcher for a lexicon of words and phrases.
+
+        Args:
+            terms: Terms to match when no lexicon file is given
+            path: Lexicon file with one term or phrase per line;
+                blank lines and lines starting with '#' are ignored
+            expand_inflections: Also match simple inflected variants
+                (plural, past tense, gerund) of single-word terms
+        """
+        self.path = path
+        self.expand_inflections = expand_inflections
+        self._terms = list(terms or [])
+        self._mtime = None
+        self._automaton = _Automaton([])
+        self.reload()
+
+    def _read_terms(self, path: str) -> List[str]:
+        """
+        Read lexicon terms from a file.
+        """
+        terms = []
+        with open(path, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    terms.append(line)
+        return terms
+
+    def _inflections(self, word: str) -> List[str]:
+        """
+        Generate simple English inflections of a word.
+        """
+        variants = [word + 's', word + 'ed', word + 'ing']
+        if word.endswith(('s', 'x', 'z', 'ch', 'sh')):
+            variants.append(word + 'es')
+        if word.endswith('e'):
+            variants.extend([word + 'd', word[:-1] + 'ing'])
+        if word.endswith('y') and len(word) > 1 and word[-2] not in 'aeiou':
+            variants.extend([word[:-1] + 'ies', word[:-1] + 'ied'])
+        return variants
+
+    def _compile(self, terms: Iterable[str]) -> _Automaton:
+        """
+        Compile terms into a new automaton.
+        """
+        phrases = set()
+        for term in terms:
+            phrase = tuple(token.lower() for token in tokenize(term))
+            if not phrase:
+                continue
+            phrases.add(phrase)
+            if self.expand_inflections and len(phrase) == 1:
+                phrases.update((variant,) for variant in self._inflections(phrase[0]))
+        return _Automaton(phrases)
+
+    def reload(self, path: Optional[str] = None):
+        """
+        Rebuild the automaton from the lexicon file (or the initial terms)
+        and swap it in atomically. Matching in progress keeps using the old
+        automaton until it finishes.
+        """
+        if path is not None:
+            self.path = path
+
+        if self.path:
+            mtime = os.path.getmtime(self.path)
+            automaton = self._compile(self._read_terms(self.path))
+        else:
+            mtime = None
+            automaton = self._compile(self._terms)
+
+        # Single attribute assignment, so readers never see a partial build
+        self._automaton = automaton
+        self._mtime = mtime
+
+    def reload_if_changed(self) -> bool:
+        """
+        Rebuild the automaton if the lexicon file changed on disk.
+        Returns True if a reload happened.
+        """
+        if not self.path or os.path.getmtime(self.path) == self._mtime:
+            return False
+        self.reload()
+        return True
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int]]:
+        """
+        Find all lexicon matches in a token list as (start, end) spans.
+        """
+        return self._automaton.find(tokens)
+
+    def match_mask(self, tokens: List[str]) -> List[bool]:
+        """
+        Mark which tokens are covered by at least one lexicon match.
+        """
+        mask = [False] * len(tokens)
+        for start, end in self._automaton.find(tokens):
+            for index in range(start, end):
+                mask[index] = True
+        return mask
+
+    def __len__(self) -> int:
+        return self._automaton.phrase_count
@@ -0,0 +1,199 @@
+from typing import Dict, List, Optional, Tuple
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+
+class MetricsSink:
+    """
+    Destination for metric snapshots. Subclasses implement write().
+    """
+    def write(self, snapshot: Dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class JsonLinesSink(MetricsSink):
+    def __init__(self, path: str):
+        """
+        Append each snapshot to path as one JSON line.
+        """
+        self.path = path
+
+    def write(self, snapshot: Dict):
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(snapshot) + '\n')
+
+class PrometheusSink(MetricsSink):
+    def __init__(self, path: Optional[str] = None, prefix: str = "content_filter"):
+        """
+        Render snapshots in the Prometheus text exposition format.
+        If path is given, each snapshot replaces the file atomically, for
+        the node exporter's textfile collector; the latest rendering is
+        also kept in self.text for serving over HTTP.
+        """
+        self.path = path
+        self.prefix = prefix
+        self.text = ""
+
+    def _labels(self, labels: Dict[str, str]) -> str:
+        if not labels:
+            return ""
+        pairs = []
+        for name, value in sorted(labels.items()):
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            pairs.append(f'{name}="{value}"')
+        return "{" + ",".join(pairs) + "}"
+
+    def render(self, snapshot: Dict) -> str:
+        """
+        Render a snapshot as Prometheus text.
+        """
+        lines = []
+        typed = set()
+        for counter in snapshot["counters"]:
+            name = f"{self.prefix}_{counter['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{self._labels(counter['labels'])} {counter['value']}")
+        for summary in snapshot["summaries"]:
+            name = f"{self.prefix}_{summary['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            labels = self._labels(summary['labels'])
+            lines.append(f"{name}_count{labels} {summary['count']}")
+            lines.append(f"{name}_sum{labels} {summary['sum']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, snapshot: Dict):
+        self.text = self.render(snapshot)
+        if self.path:
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                file.write(self.text)
+            os.replace(temp_path, self.path)
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, sinks: Optional[List[MetricsSink]] = None):
+        """
+        Collect counters and summaries (count, sum and max of observed
+        values), each identified by a name and optional labels, and write
+        snapshots of them to sinks on flush().
+
+        Metric names used by the filters:
+            stage_seconds{stage}: time spent in each processing stage
+            model_calls_total{model}, batch_size{model}: classifier calls
+                and the number of items per call
+            cache_requests_total{cache, result}: cache hits and misses
+            errors_total{stage, error}: exceptions by stage and type
+            documents_total{document_type, status}: processed documents
+        """
+        self.sinks = list(sinks or [])
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._summaries: Dict[Tuple, List[float]] = {}
+
+    def _key(self, name: str, labels: Dict[str, str]) -> Tuple:
+        return (name, tuple(sorted(labels.items())))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        Add value to a counter.
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Record one observation of a summary.
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """
+        Observe the seconds spent in the enclosed block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict:
+        """
+        Get the current value of every metric.
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            summaries = [
+                {"name": name, "labels": dict(labels), "count": count, "sum": total, "max": maximum}
+                for (name, labels), (count, total, maximum) in sorted(self._summaries.items())
+            ]
+        return {"timestamp": time.time(), "counters": counters, "summaries": summaries}
+
+    def flush(self):
+        """
+        Write a snapshot to every sink.
+        """
+        if not self.sinks:
+            return
+        snapshot = self.snapshot()
+        for sink in self.sinks:
+            sink.write(snapshot)
+
+    def reset(self):
+        """
+        Clear all metrics.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def close(self):
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+class _NullMetrics(Metrics):
+    """
+    Metrics that record nothing, used when instrumentation is disabled.
+    """
+    enabled = False
+
+    def __init__(self):
+        super().__init__()
+        self._timer = nullcontext()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        pass
+
+    def observe(self, name: str, value: float, **labels):
+        pass
+
+    def timer(self, name: str, **labels):
+        return self._timer
+
+    def flush(self):
+        pass
+
+# Shared disabled instance; the default for all components
+NULL_METRICS = _NullMetrics()
@@ -0,0 +1,76 @@
+from typing import Dict
+from contextlib import contextmanager
+import os
+import time
+
+# Local directory for exported models and other generated resources
+CACHE_DIR = os.environ.get(
+    "CONTENT_FILTER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "content_filter")
+)
+
+# Allow network downloads of missing models and data (off by default)
+ALLOW_DOWNLOADS = os.environ.get("CONTENT_FILTER_ALLOW_DOWNLOADS", "") == "1"
+
+# Inference backend for the classifiers: 'pytorch' or 'onnx'
+INFERENCE_BACKEND = os.environ.get("CONTENT_FILTER_BACKEND", "pytorch")
+
+# Run int8 dynamically quantized models with the 'onnx' backend
+QUANTIZE = os.environ.get("CONTENT_FILTER_QUANTIZE", "") == "1"
+
+TEXT_MODELS = ["unitary/toxic-bert"]
+IMAGE_MODELS = ["Falconsai/nsfw_image_detection", "microsoft/resnet-50"]
+
+@contextmanager
+def timed(load_times: Dict[str, float], name: str):
+    """
+    Record how long the enclosed block takes under load_times[name].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        load_times[name] = time.perf_counter() - start
+
+def resolve_model(model_id: str, allow_downloads: bool = ALLOW_DOWNLOADS) -> str:
+    """
+    Resolve a Hugging Face model ID to a local snapshot directory.
+    Only the local cache is consulted unless downloads are allowed.
+    """
+    from huggingface_hub import snapshot_download
+
+    try:
+        return snapshot_download(model_id, local_files_only=True)
+    except Exception:
+        if not allow_downloads:
+            raise RuntimeError(
+                f"Model {model_id} is not in the local cache. "
+                "Run 'python resources.py' once with network access to fetch it, "
+                "or set CONTENT_FILTER_ALLOW_DOWNLOADS=1"
+            )
+    return snapshot_download(model_id)
+
+def load_pipeline(task: str, model_id: str, allow_downloads: bool = ALLOW_DOWNLOADS, **kwargs):
+    """
+    Build a transformers pipeline from a locally cached model.
+    """
+    # Imported here so that importing the filters stays cheap
+    from transformers import pipeline
+
+    model_path = resolve_model(model_id, allow_downloads)
+    return pipeline(task, model=model_path, **kwargs)
+
+def download_all():
+    """
+    Fetch every model into the local cache.
+    """
+    from huggingface_hub import snapshot_download
+
+    for model_id in TEXT_MODELS + IMAGE_MODELS:
+        print(f"Fetching model: {model_id}")
+        snapshot_download(model_id)
+
+    print("All resources are available locally")
+
+if __name__ == "__main__":
+    download_all()
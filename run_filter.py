@@ -1,10 +1,16 @@
 from document_processor import DocumentProcessor
+import logging
+import os
 import traceback
 
 def main():
+    # Show the processor's progress messages
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Initialize the processor
     print("Initializing document processor...")
-    processor = DocumentProcessor()
+    # Set CONTENT_FILTER_TOXICITY_CACHE to keep verdicts across runs
+    processor = DocumentProcessor(cache_path=os.environ.get("CONTENT_FILTER_TOXICITY_CACHE"))
     
     # Process the test document
     try:
@@ -30,12 +36,23 @@ def main():
         print(f"Output file: {stats['output_file']}")
         print(f"Document type: {stats['document_type']}")
         
+        print("\nToxicity Cache:")
+        cache_stats = stats['toxicity_cache']
+        print(f"Hits: {cache_stats['hits']} ({cache_stats['disk_hits']} from disk)")
+        print(f"Misses: {cache_stats['misses']}")
+        
+        print("\nStartup Time:")
+        for component, seconds in processor.get_startup_report().items():
+            print(f"{component}: {seconds:.2f}s")
+        
     except Exception as e:
         print(f"\nError processing document:")
         print(f"Error type: {type(e).__name__}")
         print(f"Error message: {str(e)}")
         print("\nFull traceback:")
         traceback.print_exc()
+    finally:
+        processor.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
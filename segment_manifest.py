@@ -0,0 +1,131 @@
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+class SegmentManifest:
+    def __init__(self, path: str, image_signature: Union[str, Callable[[], str]] = ""):
+        """
+        Sidecar record of a filtered document: toxicity scores per text
+        segment and verdicts per image, keyed by content hash. When the
+        document is filtered again, unchanged segments and images reuse
+        these results instead of going through the models.
+
+        Args:
+            path: Manifest file, usually next to the filtered output
+            image_signature: Identifies the image models, thresholds and
+                dedupe mode; stored image verdicts are ignored if it changed.
+                May be a callable, which is only called once the document
+                turns out to have images
+
+        Segment keys already include the toxicity model, so scores from a
+        different model are never reused.
+        """
+        self.path = path
+        self._image_signature = image_signature
+        self._stored_signature = None
+        self._stored_images: Dict[str, list] = {}
+        self.previous_segments: Dict[str, List[dict]] = {}
+        self.previous_images: Optional[Dict[str, Tuple[bool, str]]] = None
+        self.segments: Dict[str, List[dict]] = {}
+        self.images: Dict[str, Tuple[bool, str]] = {}
+        self.reused_segments = 0
+        self.reused_images = 0
+
+    def load(self) -> bool:
+        """
+        Load the results of the previous run, if there was one.
+        Returns True if a usable manifest was found.
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable manifest %s: %s", self.path, e)
+            return False
+        if data.get("version") != MANIFEST_VERSION:
+            return False
+
+        self.previous_segments = data.get("segments", {})
+        self._stored_signature = data.get("image_signature")
+        self._stored_images = data.get("images", {})
+        return True
+
+    @property
+    def image_signature(self) -> str:
+        if callable(self._image_signature):
+            self._image_signature = self._image_signature()
+        return self._image_signature
+
+    def _previous_images(self) -> Dict[str, Tuple[bool, str]]:
+        """
+        Stored image verdicts, checked against the image signature on first use.
+        """
+        if self.previous_images is None:
+            self.previous_images = {}
+            if self._stored_images and self._stored_signature == self.image_signature:
+                self.previous_images = {
+                    key: (verdict[0], verdict[1]) for key, verdict in self._stored_images.items()
+                }
+        return self.previous_images
+
+    def lookup_segment(self, key: str) -> Optional[List[dict]]:
+        """
+        Get the stored scores of a segment, carrying them into the new manifest.
+        """
+        scores = self.previous_segments.get(key)
+        if scores is not None and key not in self.segments:
+            self.segments[key] = scores
+            self.reused_segments += 1
+        return scores
+
+    def add_segment(self, key: str, scores: List[dict]):
+        self.segments[key] = scores
+
+    def lookup_image(self, key: str) -> Optional[Tuple[bool, str]]:
+        """
+        Get the stored verdict of an image, carrying it into the new manifest.
+        """
+        verdict = self._previous_images().get(key)
+        if verdict is not None and key not in self.images:
+            self.images[key] = verdict
+            self.reused_images += 1
+        return verdict
+
+    def add_image(self, key: str, verdict: Tuple[bool, str]):
+        self.images[key] = verdict
+
+    def save(self):
+        """
+        Write the manifest for this run, replacing the previous one
+        atomically. Only segments and images still in the document are kept.
+        """
+        data = {
+            "version": MANIFEST_VERSION,
+            "image_signature": self.image_signature if self.images else "",
+            "segments": self.segments,
+            "images": {key: list(verdict) for key, verdict in self.images.items()}
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(temp_path, self.path)
+
+    def get_stats(self) -> Dict:
+        """
+        Get how many distinct segments and images were reused from the
+        previous run and how many were new or changed.
+        """
+        return {
+            "manifest": self.path,
+            "reused_segments": self.reused_segments,
+            "new_segments": len(self.segments) - self.reused_segments,
+            "reused_images": self.reused_images,
+            "new_images": len(self.images) - self.reused_images
+        }
@@ -1,36 +1,110 @@
-from typing import List
-import spacy
-from transformers import pipeline
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import wordnet
-import re
+from typing import List, Optional, Tuple
+
+from inference_backend import load_text_classifier
+from lexicon_matcher import LexiconMatcher, token_spans, tokenize
+from metrics import NULL_METRICS, Metrics
+from resources import ALLOW_DOWNLOADS, INFERENCE_BACKEND, QUANTIZE, timed
+from text_scheduler import TextScheduler
+from text_validity import classify_texts
+from toxicity_cache import ToxicityCache
 
 class TextFilter:
-    def __init__(self):
+    def __init__(
+        self,
+        batch_size: int = 32,
+        cache_size: int = 10000,
+        cache_path: Optional[str] = None,
+        cache_max_age: Optional[float] = None,
+        lexicon_path: Optional[str] = None,
+        expand_inflections: bool = False,
+        allow_downloads: bool = ALLOW_DOWNLOADS,
+        backend: str = INFERENCE_BACKEND,
+        quantize: bool = QUANTIZE,
+        max_tokens: int = 512,
+        window_overlap: int = 64,
+        metrics: Metrics = NULL_METRICS
+    ):
         """
         Initialize the text filter with required models and resources.
+        
+        Args:
+            batch_size: Maximum number of segments sent to the toxicity
+                classifier in a single forward pass; segments are grouped
+                by length so little compute goes to padding
+            cache_size: Number of toxicity verdicts kept in the in-memory cache
+            cache_path: Optional SQLite file for a persistent verdict cache
+                shared across runs
+            cache_max_age: Maximum age in seconds of cached verdicts
+            lexicon_path: Optional lexicon file with one inappropriate word
+                or phrase per line; defaults to the built-in word set
+            expand_inflections: Also match simple inflected variants of
+                single-word lexicon terms
+            allow_downloads: Fetch missing models from the network
+                instead of failing
+            backend: Inference backend for the toxicity model, 'pytorch'
+                or 'onnx' (falls back to PyTorch if onnxruntime is missing)
+            quantize: Use an int8 quantized model with the 'onnx' backend
+            max_tokens: Input limit of the toxicity model; longer segments
+                are scored as overlapping windows instead of being truncated
+            window_overlap: Tokens shared by consecutive windows
+            metrics: Where stage timings, model calls and cache hit rates
+                are recorded; disabled by default
+        
+        Models are loaded on first use from the local cache.
         """
-        # Load spaCy model
-        self.nlp = spacy.load("en_core_web_sm")
+        self.batch_size = batch_size
+        self.allow_downloads = allow_downloads
+        self.backend = backend
+        self.quantize = quantize
+        self.metrics = metrics
+        self.toxicity_threshold = 0.7
+        self.toxicity_model_id = "unitary/toxic-bert"
         
-        # Load BERT-based toxicity classifier
-        self.toxicity_classifier = pipeline(
-            "text-classification",
-            model="unitary/toxic-bert",
-            return_all_scores=True
-        )
+        # Time spent loading each component, for startup reports
+        self.load_times = {}
+        self._toxicity_classifier = None
         
-        # Initialize inappropriate words set
-        self.inappropriate_words = self._load_inappropriate_words()
+        # Cache of classifier scores keyed by normalized text and model;
+        # int8 scores differ slightly, so they are cached separately
+        cache_model_id = self.toxicity_model_id
+        if backend == "onnx" and quantize:
+            cache_model_id += ":int8"
+        self.toxicity_cache = ToxicityCache(
+            cache_model_id,
+            max_entries=cache_size,
+            db_path=cache_path,
+            max_age_seconds=cache_max_age
+        )
         
-        # Load NLTK resources
-        nltk.download('punkt', quiet=True)
-        nltk.download('wordnet', quiet=True)
-        nltk.download('averaged_perceptron_tagger', quiet=True)
+        # Length-bucketed batching and windowing of long segments
+        self.scheduler = TextScheduler(
+            batch_size=batch_size,
+            max_tokens=max_tokens,
+            window_overlap=window_overlap,
+            metrics=metrics
+        )
         
-        # Compile regex for detecting binary/non-text content
-        self.binary_pattern = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\xFF]')
+        # Compile the inappropriate words lexicon
+        self.lexicon = LexiconMatcher(
+            terms=self._load_inappropriate_words(),
+            path=lexicon_path,
+            expand_inflections=expand_inflections
+        )
+    
+    @property
+    def toxicity_classifier(self):
+        """
+        BERT-based toxicity classifier, loaded on first use.
+        """
+        if self._toxicity_classifier is None:
+            with timed(self.load_times, "toxicity_classifier"):
+                self._toxicity_classifier = load_text_classifier(
+                    self.toxicity_model_id,
+                    backend=self.backend,
+                    quantize=self.quantize,
+                    allow_downloads=self.allow_downloads
+                )
+        return self._toxicity_classifier
     
     def _load_inappropriate_words(self) -> set:
         """
@@ -43,38 +117,45 @@ class TextFilter:
             # Add more words as needed
         }
     
+    def reload_lexicon(self, path: Optional[str] = None):
+        """
+        Rebuild the lexicon matcher, optionally from a new file, and swap it in.
+        """
+        self.lexicon.reload(path)
+    
+    def reload_lexicon_if_changed(self) -> bool:
+        """
+        Reload the lexicon file if it changed on disk since it was loaded.
+        Returns True if a reload happened.
+        """
+        return self.lexicon.reload_if_changed()
+    
+    def close(self):
+        """
+        Trim and close the persistent verdict cache, if there is one.
+        """
+        self.toxicity_cache.close()
+    
     def _is_binary_content(self, text: str) -> bool:
         """
         Check if the text contains binary/non-text content.
         """
-        # Check for binary characters
-        if self.binary_pattern.search(text):
-            return True
-        
-        # Check for long strings of special characters
-        special_chars = sum(1 for c in text if not c.isalnum() and not c.isspace())
-        if len(text) > 0 and special_chars / len(text) > 0.5:
-            return True
-        
-        return False
+        return bool(classify_texts([text])[0][0])
     
     def _is_valid_text(self, text: str) -> bool:
         """
         Check if the text is valid for processing.
         """
-        if not text or not text.strip():
-            return False
-        
-        # Skip binary content
-        if self._is_binary_content(text):
-            return False
-        
-        # Check if text contains actual words
-        words = [w for w in text.split() if any(c.isalpha() for c in w)]
-        if not words:
-            return False
-        
-        return True
+        return bool(classify_texts([text])[1][0])
+    
+    def _is_toxic_result(self, results: List[dict]) -> bool:
+        """
+        Decide whether classifier scores for one text are toxic.
+        """
+        for result in results:
+            if result['label'] == 'toxic' and result['score'] > self.toxicity_threshold:
+                return True
+        return False
     
     def _check_toxicity(self, text: str) -> bool:
         """
@@ -83,11 +164,73 @@ class TextFilter:
         if not self._is_valid_text(text):
             return False
             
-        results = self.toxicity_classifier(text)[0]
-        for result in results:
-            if result['label'] == 'toxic' and result['score'] > 0.7:
-                return True
-        return False
+        results = self.score_toxicity([text])[0]
+        return self._is_toxic_result(results)
+    
+    def score_toxicity(self, texts: List[str]) -> List[List[dict]]:
+        """
+        Get classifier scores for a list of valid texts.
+        
+        Scores are served from the verdict cache where possible; the
+        remaining unique texts are run through the classifier by the
+        scheduler, which batches them by length and scores long texts as
+        windows, keeping the highest score of each label.
+        """
+        scores = self.toxicity_cache.get_many(texts)
+        if self.metrics.enabled:
+            misses = scores.count(None)
+            self.metrics.increment("cache_requests_total", len(scores) - misses, cache="toxicity", result="hit")
+            self.metrics.increment("cache_requests_total", misses, cache="toxicity", result="miss")
+        
+        # Group cache misses so repeated texts are classified once
+        pending = {}
+        for index, (text, result) in enumerate(zip(texts, scores)):
+            if result is None:
+                pending.setdefault(text, []).append(index)
+        
+        missing = list(pending)
+        computed = []
+        if missing:
+            with self.metrics.timer("stage_seconds", stage="toxicity"):
+                computed = self.scheduler.run(self.toxicity_classifier, missing)
+        
+        for text, result in zip(missing, computed):
+            for index in pending[text]:
+                scores[index] = result
+        self.toxicity_cache.put_many(missing, computed)
+        return scores
+    
+    def _remove_inappropriate_words(self, text: str) -> str:
+        """
+        Remove inappropriate words from text that is not toxic as a whole.
+        """
+        tokens = tokenize(text)
+        return self._join_unmatched(tokens, self.lexicon.match_mask(tokens))
+    
+    def _join_unmatched(self, tokens: List[str], mask: List[bool]) -> str:
+        """
+        Join the tokens not covered by a lexicon match.
+        """
+        return ' '.join(token for token, matched in zip(tokens, mask) if not matched)
+    
+    def removed_spans(self, record: dict) -> List[Tuple[int, int]]:
+        """
+        Get the character (start, end) spans of record["text"] the lexicon
+        removed from a completed record that was kept, e.g. to redact them
+        in place. Consecutive removed tokens, such as a matched phrase,
+        form one span.
+        """
+        if not record["valid"] or record["toxic"] or not record["lexicon_hits"]:
+            return []
+        spans = []
+        previous = False
+        for (start, end), matched in zip(token_spans(record["text"]), record["lexicon_mask"]):
+            if matched and previous:
+                spans[-1] = (spans[-1][0], end)
+            elif matched:
+                spans.append((start, end))
+            previous = matched
+        return spans
     
     def filter_text(self, text: str) -> str:
         """
@@ -99,76 +242,179 @@ class TextFilter:
             return text
             
         # First check if entire text is toxic
-        if self._check_toxicity(text):
+        if self._is_toxic_result(self.score_toxicity([text])[0]):
             return ""  # Remove entire text if toxic
             
-        # Tokenize text
-        doc = self.nlp(text)
-        filtered_words = []
+        return self._remove_inappropriate_words(text)
+    
+    def _new_record(self, text: str, binary: bool, valid: bool) -> dict:
+        """
+        Create the analysis record for a single text segment.
         
-        for token in doc:
-            word = token.text.lower()
+        The record holds everything later stages need: the stripped text
+        and its validity (from classify_texts) here, then tokens and
+        lexicon hits from _tokenize_record. Toxicity fields are filled in
+        by complete_records once the classifier has run.
+        """
+        stripped = text.strip() if text else ''
+        record = {
+            "text": stripped,
+            "binary": binary,
+            "valid": valid,
+            "tokens": [],
+            "lexicon_mask": [],
+            "lexicon_hits": 0,
+            "toxicity_scores": None,
+            "toxic": False,
+            "filtered": '\n',
+        }
+        if stripped and not binary and not valid:
+            # Invalid text is passed through unchanged
+            record["filtered"] = stripped + '\n'
+        return record
+    
+    def _tokenize_record(self, record: dict):
+        """
+        Fill in the tokens and lexicon matches of a valid record. These
+        tokens are the only tokenization of the segment: word counts and
+        the filtered text are both built from them.
+        """
+        record["tokens"] = tokenize(record["text"])
+        record["lexicon_mask"] = self.lexicon.match_mask(record["tokens"])
+        record["lexicon_hits"] = sum(record["lexicon_mask"])
+    
+    def prepare_records(self, texts: List[str]) -> List[dict]:
+        """
+        Create analysis records for a list of texts without running the
+        toxicity classifier. Records with record["valid"] set still need
+        scores from score_toxicity passed to complete_records.
+        """
+        with self.metrics.timer("stage_seconds", stage="validity"):
+            # One vectorized pass classifies every segment
+            binary, valid = classify_texts(texts)
+            records = [
+                self._new_record(text, bool(is_binary), bool(is_valid))
+                for text, is_binary, is_valid in zip(texts, binary, valid)
+            ]
+        with self.metrics.timer("stage_seconds", stage="tokenize"):
+            for record in records:
+                if record["valid"]:
+                    self._tokenize_record(record)
+        return records
+    
+    def complete_records(self, records: List[dict], scores: List[List[dict]]):
+        """
+        Attach toxicity scores to valid records and compute their filtered text.
+        """
+        for record, results in zip(records, scores):
+            record["toxicity_scores"] = results
+            record["toxic"] = self._is_toxic_result(results)
+            if record["toxic"]:
+                continue  # Keep line spacing for removed content
             
-            # Skip inappropriate words
-            if word in self.inappropriate_words:
-                continue
-            else:
-                filtered_words.append(token.text)
+            filtered_text = self._join_unmatched(record["tokens"], record["lexicon_mask"])
+            if filtered_text:  # Only add non-empty filtered text
+                record["filtered"] = filtered_text + '\n'
+    
+    def _score_with_manifest(self, texts: List[str], manifest) -> List[List[dict]]:
+        """
+        Score texts, reusing scores stored in a segment manifest and
+        recording new scores in it.
+        """
+        keys = [self.toxicity_cache.make_key(text) for text in texts]
+        scores = [manifest.lookup_segment(key) for key in keys]
+        missing = [index for index, result in enumerate(scores) if result is None]
+        computed = self.score_toxicity([texts[index] for index in missing])
+        for index, result in zip(missing, computed):
+            scores[index] = result
+            manifest.add_segment(keys[index], result)
+        return scores
+    
+    def analyze_texts(self, texts: List[str], manifest=None) -> List[dict]:
+        """
+        Analyze a list of texts in a single pass.
+        Returns one analysis record per input text, in order.
         
-        # Join remaining words
-        return ' '.join(filtered_words)
+        Valid segments are gathered first and sent through the toxicity
+        classifier in batches; scores are then mapped back to their
+        original positions. With a SegmentManifest, segments unchanged since
+        the previous run reuse their stored scores.
+        """
+        records = self.prepare_records(texts)
+        candidates = [record for record in records if record["valid"]]
+        
+        # Run toxicity detection over all candidates in batches
+        candidate_texts = [record["text"] for record in candidates]
+        if manifest is None:
+            scores = self.score_toxicity(candidate_texts)
+        else:
+            scores = self._score_with_manifest(candidate_texts, manifest)
+        self.complete_records(candidates, scores)
+        return records
     
     def filter_texts(self, texts: List[str]) -> List[str]:
         """
         Filter a list of texts by removing inappropriate content.
         Preserves document structure with empty lines where content was removed.
         """
-        filtered_texts = []
-        for text in texts:
-            # Skip binary content
-            if text and self._is_binary_content(text):
-                filtered_texts.append('\n')
-                continue
-                
-            # Process valid text
-            if text.strip():
-                filtered_text = self.filter_text(text.strip())
-                if filtered_text:  # Only add non-empty filtered text
-                    filtered_texts.append(filtered_text + '\n')
-                else:
-                    filtered_texts.append('\n')  # Keep line spacing
-            else:
-                filtered_texts.append('\n')
-        return filtered_texts
+        return [record["filtered"] for record in self.analyze_texts(texts)]
     
-    def get_content_stats(self, texts: List[str]) -> dict:
+    def filter_and_stats(self, texts: List[str], manifest=None) -> Tuple[List[str], dict]:
         """
-        Get statistics about filtered content.
+        Filter a list of texts and collect content statistics in one pass.
+        Returns (filtered_texts, stats).
+        """
+        records = self.analyze_texts(texts, manifest)
+        filtered_texts = [record["filtered"] for record in records]
+        return filtered_texts, self.get_record_stats(records)
+    
+    def get_record_stats(self, records: List[dict]) -> dict:
+        """
+        Get statistics about filtered content from analysis records.
         """
         total_words = 0
         filtered_words = 0
         toxic_contexts = 0
         
-        for text in texts:
-            # Skip binary content
-            if not self._is_valid_text(text):
+        for record in records:
+            # Skip binary and invalid content
+            if not record["valid"]:
                 continue
-                
-            words = word_tokenize(text)
+            
+            words = record["tokens"]
             total_words += len(words)
             
             # Count filtered words
-            filtered_words += sum(1 for word in words if word.lower() in self.inappropriate_words)
+            filtered_words += record["lexicon_hits"]
             
             # Count toxic contexts and their words
-            if self._check_toxicity(text):
+            if record["toxic"]:
                 toxic_contexts += 1
                 # Add all words from toxic contexts to filtered count
-                filtered_words += len([w for w in words if w.lower() not in self.inappropriate_words])
+                filtered_words += len(words) - record["lexicon_hits"]
         
         return {
             "total_words": total_words,
             "filtered_words": filtered_words,
             "toxic_contexts": toxic_contexts,
             "clean_ratio": (total_words - filtered_words) / total_words if total_words > 0 else 1.0
-        } 
\ No newline at end of file
+        }
+    
+    def merge_stats(self, stats_list: List[dict]) -> dict:
+        """
+        Combine statistics computed over separate chunks of one document.
+        """
+        total_words = sum(stats["total_words"] for stats in stats_list)
+        filtered_words = sum(stats["filtered_words"] for stats in stats_list)
+        return {
+            "total_words": total_words,
+            "filtered_words": filtered_words,
+            "toxic_contexts": sum(stats["toxic_contexts"] for stats in stats_list),
+            "clean_ratio": (total_words - filtered_words) / total_words if total_words > 0 else 1.0
+        }
+    
+    def get_content_stats(self, texts: List[str]) -> dict:
+        """
+        Get statistics about filtered content.
+        """
+        return self.get_record_stats(self.analyze_texts(texts))
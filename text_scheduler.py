@@ -0,0 +1,145 @@
+from typing import Callable, Dict, List, Tuple
+
+from metrics import NULL_METRICS, Metrics
+
+class TextScheduler:
+    def __init__(
+        self,
+        batch_size: int = 32,
+        max_tokens: int = 512,
+        window_overlap: int = 64,
+        max_batch_tokens: int = 8192,
+        metrics: Metrics = NULL_METRICS
+    ):
+        """
+        Initialize a scheduler that runs texts through a classifier with
+        little padding and without truncating long texts.
+
+        Args:
+            batch_size: Maximum number of windows per forward pass
+            max_tokens: Model input limit, including special tokens
+            window_overlap: Tokens shared by consecutive windows of a long
+                text, so phrases on a window boundary are seen whole
+            max_batch_tokens: Maximum padded tokens per forward pass; long
+                windows are batched in smaller groups than short ones
+            metrics: Where model calls and batch sizes are recorded
+        """
+        if window_overlap >= max_tokens // 2:
+            raise ValueError("window_overlap must be less than half of max_tokens")
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.window_overlap = window_overlap
+        self.max_batch_tokens = max_batch_tokens
+        self.metrics = metrics
+        self.stats = {
+            "texts": 0,
+            "windowed_texts": 0,
+            "windows": 0,
+            "batches": 0,
+            "tokens": 0,
+            "padded_tokens": 0
+        }
+
+    def _windows(self, tokenizer, texts: List[str], limit: int) -> List[Tuple[int, str, int]]:
+        """
+        Split texts into windows of at most limit tokens.
+        Returns (text index, window text, token count) triples. Windows are
+        slices of the original text cut at token boundaries.
+        """
+        if not getattr(tokenizer, "is_fast", False):
+            # Offsets need a fast tokenizer; long texts are truncated instead
+            lengths = [len(ids) for ids in tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]]
+            return [(index, text, min(length, limit)) for index, (text, length) in enumerate(zip(texts, lengths))]
+
+        step = limit - self.window_overlap
+        encoded = tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            verbose=False
+        )
+
+        windows = []
+        for index, (text, offsets) in enumerate(zip(texts, encoded["offset_mapping"])):
+            if len(offsets) <= limit:
+                windows.append((index, text, len(offsets)))
+                continue
+            self.stats["windowed_texts"] += 1
+            for start in range(0, len(offsets), step):
+                end = min(start + limit, len(offsets))
+                windows.append((index, text[offsets[start][0]:offsets[end - 1][1]], end - start))
+                if end == len(offsets):
+                    break
+        return windows
+
+    def _buckets(self, windows: List[Tuple[int, str, int]], special: int) -> List[List[Tuple[int, str, int]]]:
+        """
+        Group windows of similar length into batches.
+        """
+        batches = []
+        batch = []
+        for window in sorted(windows, key=lambda window: window[2]):
+            # Windows are sorted, so the current one sets the padded length
+            padded = (len(batch) + 1) * (window[2] + special)
+            if batch and (len(batch) == self.batch_size or padded > self.max_batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(window)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _aggregate(self, window_scores: List[List[dict]]) -> List[dict]:
+        """
+        Combine the scores of one text's windows into one result, taking
+        the highest score of each label: a text is as toxic as its worst part.
+        """
+        if len(window_scores) == 1:
+            return window_scores[0]
+        best = {}
+        for scores in window_scores:
+            for result in scores:
+                if result['score'] > best.get(result['label'], -1.0):
+                    best[result['label']] = result['score']
+        return [{'label': label, 'score': score} for label, score in best.items()]
+
+    def run(self, classifier: Callable, texts: List[str]) -> List[List[dict]]:
+        """
+        Score texts with a text-classification pipeline (or a classifier
+        with the same interface and a .tokenizer). Returns one list of label
+        scores per text, in input order.
+        """
+        if not texts:
+            return []
+        tokenizer = classifier.tokenizer
+        special = tokenizer.num_special_tokens_to_add()
+        windows = self._windows(tokenizer, texts, self.max_tokens - special)
+
+        window_scores = [[] for _ in texts]
+        for batch in self._buckets(windows, special):
+            results = classifier(
+                [text for _, text, _ in batch], batch_size=len(batch), truncation=True
+            )
+            for (index, _, _), scores in zip(batch, results):
+                window_scores[index].append(scores)
+
+            self.metrics.increment("model_calls_total", model="toxicity")
+            self.metrics.observe("batch_size", len(batch), model="toxicity")
+            self.stats["batches"] += 1
+            self.stats["tokens"] += sum(length + special for _, _, length in batch)
+            self.stats["padded_tokens"] += len(batch) * (batch[-1][2] + special)
+
+        self.stats["texts"] += len(texts)
+        self.stats["windows"] += len(windows)
+        return [self._aggregate(scores) for scores in window_scores]
+
+    def get_stats(self) -> Dict:
+        """
+        Get scheduling counters, including the share of computed tokens
+        that were padding.
+        """
+        stats = dict(self.stats)
+        padded = stats["padded_tokens"]
+        stats["padding_ratio"] = 1.0 - stats["tokens"] / padded if padded > 0 else 0.0
+        return stats
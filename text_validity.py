@@ -0,0 +1,83 @@
+from typing import List, Optional, Tuple
+import numpy as np
+
+# Character class bits
+ALPHA = 1
+ALNUM = 2
+SPACE = 4
+BINARY = 8
+
+# Control characters and the Latin-1 upper half mark binary/non-text content
+BINARY_RANGES = ((0x00, 0x08), (0x0B, 0x0C), (0x0E, 0x1F), (0x7F, 0xFF))
+
+_bmp_classes: Optional[np.ndarray] = None
+
+def _char_classes(codes: np.ndarray) -> np.ndarray:
+    """
+    Character class bits of an array of code points, using the same
+    Unicode rules as str.isalpha, str.isalnum and str.isspace.
+    """
+    chars = codes.astype(np.uint32).view('U1')
+    classes = (
+        np.char.isalpha(chars) * ALPHA
+        | np.char.isalnum(chars) * ALNUM
+        | np.char.isspace(chars) * SPACE
+    ).astype(np.uint8)
+    for low, high in BINARY_RANGES:
+        classes[(codes >= low) & (codes <= high)] |= BINARY
+    return classes
+
+def _class_table() -> np.ndarray:
+    """
+    Character class of every code point in the Basic Multilingual Plane,
+    built on first use.
+    """
+    global _bmp_classes
+    if _bmp_classes is None:
+        _bmp_classes = _char_classes(np.arange(0x10000, dtype=np.uint32))
+    return _bmp_classes
+
+def _segment_sums(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Sum values over each [start, end) range, empty ranges included.
+    """
+    totals = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return totals[ends] - totals[starts]
+
+def classify_texts(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Classify every text in one sweep over their concatenated code points.
+    Returns two boolean arrays, (binary, valid), with one entry per text.
+
+    A text is binary if it contains a control or Latin-1 upper half
+    character, or if more than half of its characters are neither
+    alphanumeric nor whitespace. A text is valid if, once stripped, it is
+    non-empty, not binary and contains at least one letter.
+    """
+    texts = [text or '' for text in texts]
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+
+    codes = np.frombuffer(''.join(texts).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    classes = np.zeros(len(codes), dtype=np.uint8)
+    bmp = codes < 0x10000
+    classes[bmp] = _class_table()[codes[bmp]]
+    if not bmp.all():
+        classes[~bmp] = _char_classes(codes[~bmp])
+
+    special = _segment_sums((classes & (ALNUM | SPACE)) == 0, starts, ends)
+    has_binary = _segment_sums((classes & BINARY) != 0, starts, ends) > 0
+    has_alpha = _segment_sums((classes & ALPHA) != 0, starts, ends) > 0
+    binary = has_binary | (2 * special > lengths)
+
+    # Length of each text without leading and trailing whitespace
+    solid = np.flatnonzero((classes & SPACE) == 0)
+    first = np.searchsorted(solid, starts)
+    last = np.searchsorted(solid, ends) - 1
+    nonempty = first <= last
+    stripped = np.zeros(len(texts), dtype=np.int64)
+    stripped[nonempty] = solid[last[nonempty]] - solid[first[nonempty]] + 1
+
+    valid = ~binary & (stripped > 0) & (2 * special <= stripped) & has_alpha
+    return binary, valid
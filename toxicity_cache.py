@@ -0,0 +1,249 @@
+from typing import Dict, List, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+class ToxicityCache:
+    def __init__(
+        self,
+        model_id: str,
+        max_entries: int = 10000,
+        db_path: Optional[str] = None,
+        max_db_entries: int = 1000000,
+        max_age_seconds: Optional[float] = None,
+        evict_interval: int = 10000
+    ):
+        """
+        Initialize a content-addressed cache of toxicity classifier scores.
+
+        Args:
+            model_id: Identifier of the classifier; part of every cache key
+            max_entries: Maximum number of entries kept in the in-memory LRU
+            db_path: Optional SQLite file that persists entries across runs
+            max_db_entries: Maximum number of entries kept in the SQLite store
+            max_age_seconds: Entries older than this are treated as misses
+                and evicted; None keeps entries forever
+            evict_interval: The SQLite store is trimmed after this many
+                inserts, and again when the cache is closed
+        """
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.max_db_entries = max_db_entries
+        self.max_age_seconds = max_age_seconds
+        self.evict_interval = evict_interval
+        self._inserts_since_evict = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._whitespace_pattern = re.compile(r'\s+')
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            self._db = self._open_db(db_path)
+
+    def _open_db(self, db_path: str) -> sqlite3.Connection:
+        """
+        Open (and create if needed) the on-disk SQLite store.
+        """
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+
+        db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS toxicity_cache ("
+            "key TEXT PRIMARY KEY, scores TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS toxicity_cache_created_at "
+            "ON toxicity_cache (created_at)"
+        )
+        db.commit()
+        return db
+
+    def _normalize(self, text: str) -> str:
+        """
+        Normalize text so that trivially different copies share a key.
+        """
+        text = unicodedata.normalize('NFC', text)
+        return self._whitespace_pattern.sub(' ', text).strip()
+
+    def make_key(self, text: str) -> str:
+        """
+        Build the cache key for a text: a hash of the model ID and normalized text.
+        """
+        digest = hashlib.sha256()
+        digest.update(self.model_id.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(self._normalize(text).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        """
+        Check if an entry created at the given time is past its maximum age.
+        """
+        return self.max_age_seconds is not None and now - created_at > self.max_age_seconds
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[dict]]]:
+        """
+        Look up cached scores for a list of texts.
+        Returns a list aligned with texts, with None for every miss.
+        """
+        keys = [self.make_key(text) for text in texts]
+        results = [None] * len(texts)
+        now = time.time()
+
+        with self._lock:
+            disk_lookups = {}
+            for index, key in enumerate(keys):
+                entry = self._memory.get(key)
+                if entry is not None and self._is_expired(entry[1], now):
+                    del self._memory[key]
+                    entry = None
+
+                if entry is not None:
+                    self._memory.move_to_end(key)
+                    results[index] = entry[0]
+                    self.hits += 1
+                elif self._db is not None:
+                    disk_lookups.setdefault(key, []).append(index)
+                else:
+                    self.misses += 1
+
+            if disk_lookups:
+                found = self._read_db(list(disk_lookups), now)
+                for key, indices in disk_lookups.items():
+                    if key in found:
+                        scores, created_at = found[key]
+                        self._remember(key, scores, created_at)
+                        for index in indices:
+                            results[index] = scores
+                        self.hits += len(indices)
+                        self.disk_hits += len(indices)
+                    else:
+                        self.misses += len(indices)
+
+        return results
+
+    def put_many(self, texts: List[str], scores: List[List[dict]]):
+        """
+        Store classifier scores for a list of texts.
+        """
+        now = time.time()
+        entries = [(self.make_key(text), result) for text, result in zip(texts, scores)]
+
+        with self._lock:
+            for key, result in entries:
+                self._remember(key, result, now)
+
+            if self._db is not None and entries:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO toxicity_cache (key, scores, created_at) "
+                    "VALUES (?, ?, ?)",
+                    [(key, json.dumps(result), now) for key, result in entries]
+                )
+                self._db.commit()
+                
+                # Keep the store bounded while it is in use, not only on close
+                self._inserts_since_evict += len(entries)
+                if self._inserts_since_evict >= self.evict_interval:
+                    self._evict(now)
+
+    def _remember(self, key: str, scores: List[dict], created_at: float):
+        """
+        Insert an entry into the in-memory LRU, evicting the oldest if full.
+        Must be called with the lock held.
+        """
+        self._memory[key] = (scores, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_db(self, keys: List[str], now: float) -> Dict[str, tuple]:
+        """
+        Read entries for the given keys from the SQLite store, skipping expired ones.
+        Must be called with the lock held.
+        """
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._db.execute(
+                f"SELECT key, scores, created_at FROM toxicity_cache WHERE key IN ({placeholders})",
+                chunk
+            )
+            for key, scores, created_at in rows:
+                if not self._is_expired(created_at, now):
+                    found[key] = (json.loads(scores), created_at)
+        return found
+
+    def evict(self):
+        """
+        Remove expired entries and trim the SQLite store to max_db_entries.
+        """
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now: float):
+        """
+        Remove expired entries and trim the SQLite store.
+        Must be called with the lock held.
+        """
+        if self.max_age_seconds is not None:
+            expired = [
+                key for key, (_, created_at) in self._memory.items()
+                if self._is_expired(created_at, now)
+            ]
+            for key in expired:
+                del self._memory[key]
+
+        if self._db is None:
+            return
+
+        if self.max_age_seconds is not None:
+            self._db.execute(
+                "DELETE FROM toxicity_cache WHERE created_at < ?",
+                (now - self.max_age_seconds,)
+            )
+
+        # Drop the oldest entries beyond the size limit
+        self._db.execute(
+            "DELETE FROM toxicity_cache WHERE key IN ("
+            "SELECT key FROM toxicity_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_db_entries,)
+        )
+        self._db.commit()
+        self._inserts_since_evict = 0
+
+    def get_stats(self) -> dict:
+        """
+        Get hit/miss counters for the cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups > 0 else 0.0,
+            "memory_entries": len(self._memory)
+        }
+
+    def close(self):
+        """
+        Trim and close the on-disk store.
+        """
+        if self._db is not None:
+            self.evict()
+            self._db.close()
+            self._db = None
@@ -1,10 +1,21 @@
 import os
-from typing import Tuple, List
+from typing import Dict, Iterator, Tuple, List, Optional, TextIO
+import codecs
+import chardet
 import docx
 import fitz  # PyMuPDF
+from lxml import etree
 from PIL import Image
+import hashlib
 import io
+import logging
+import posixpath
 import re
+import zipfile
+
+from lexicon_matcher import token_spans, tokenize
+
+logger = logging.getLogger(__name__)
 
 def get_document_type(file_path: str) -> str:
     """
@@ -20,27 +31,254 @@ def get_document_type(file_path: str) -> str:
     else:
         raise ValueError(f"Unsupported file format: {ext}")
 
+# Image formats python-docx can embed as they are
+DOCX_IMAGE_FORMATS = {'JPEG', 'PNG', 'GIF', 'BMP', 'TIFF'}
+
+def _open_image(image_bytes: bytes, image_cache: Dict[tuple, Image.Image]) -> Image.Image:
+    """
+    Open image bytes as a lazy PIL image, reusing the image opened for
+    identical bytes seen before. Only the header is read here: the pixels
+    are decoded on demand, and the image filter decodes its own reduced
+    copy from the bytes, so extracted images hold little more than their
+    encoded bytes. The SHA-256 of the bytes is kept in
+    image.info['content_hash'] so the image filter can dedupe verdicts,
+    and the bytes and their format in image.info['encoded_bytes'] and
+    image.info['encoded_format'] so clean images are saved unchanged.
+    """
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+    cache_key = ('sha256', content_hash)
+    if cache_key in image_cache:
+        return image_cache[cache_key]
+    
+    image = Image.open(io.BytesIO(image_bytes))
+    image_format = image.format
+    image.info['content_hash'] = content_hash
+    image.info['encoded_bytes'] = image_bytes
+    image.info['encoded_format'] = image_format
+    image_cache[cache_key] = image
+    return image
+
+def _encode_image(image: Image.Image) -> bytes:
+    """
+    Encode an image as PNG for writing.
+    """
+    if image.mode not in ('1', 'L', 'LA', 'I', 'P', 'RGB', 'RGBA'):
+        image = image.convert('RGB')
+    with io.BytesIO() as bio:
+        image.save(bio, format='PNG')
+        return bio.getvalue()
+
+def _image_bytes(image: Image.Image, formats=None) -> bytes:
+    """
+    Get the bytes to write for an image: the original encoded bytes from
+    extraction when their format is in formats (or any format if formats
+    is None), otherwise a PNG encoding of the decoded image.
+    """
+    original = image.info.get('encoded_bytes')
+    if original is not None and (formats is None or image.info.get('encoded_format') in formats):
+        return original
+    return _encode_image(image)
+
+# WordprocessingML elements read when extracting paragraph text
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W_P = f'{{{W_NS}}}p'
+W_T = f'{{{W_NS}}}t'
+W_TEXT_TAGS = (W_T, f'{{{W_NS}}}tab', f'{{{W_NS}}}br', f'{{{W_NS}}}cr')
+RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+# Parts of a .docx holding text, besides the main document
+DOCX_TEXT_RELS = ('header', 'footer', 'footnotes', 'endnotes')
+
+def _docx_rels(package: zipfile.ZipFile, part_name: str) -> List[Tuple[str, str]]:
+    """
+    Get the internal relationships of a package part as (type, target)
+    pairs, with the type shortened to its last path segment and the
+    target resolved to a part name. An empty part_name gives the
+    package relationships.
+    """
+    directory, name = posixpath.split(part_name)
+    rels_name = posixpath.join(directory, '_rels', name + '.rels')
+    try:
+        root = etree.fromstring(package.read(rels_name))
+    except KeyError:
+        return []
+    
+    rels = []
+    for rel in root.iter(f'{{{RELS_NS}}}Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target')
+        if target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(directory, target))
+        rels.append((rel.get('Type').rsplit('/', 1)[-1], target))
+    return rels
+
+def _docx_text_parts(package: zipfile.ZipFile) -> List[str]:
+    """
+    Get the parts of a .docx holding text: the main document, then its
+    headers, footers, footnotes and endnotes.
+    """
+    main = [target for rel_type, target in _docx_rels(package, '') if rel_type == 'officeDocument']
+    parts = main[:1]
+    for rel_type, target in _docx_rels(package, parts[0]) if parts else []:
+        if rel_type in DOCX_TEXT_RELS and target not in parts:
+            parts.append(target)
+    return parts
+
+def _docx_image_parts(package: zipfile.ZipFile, text_parts: List[str]) -> List[str]:
+    """
+    Get the media parts referenced as images by the text parts.
+    """
+    images = []
+    for part in text_parts:
+        for rel_type, target in _docx_rels(package, part):
+            if rel_type == 'image' and target not in images:
+                images.append(target)
+    return images
+
+def _docx_text_elements(paragraph: etree._Element) -> List[etree._Element]:
+    """
+    Get the text, tab and break elements of a paragraph, leaving out those
+    of paragraphs nested in it (e.g. in text boxes).
+    """
+    elements = []
+    for element in paragraph.iter(*W_TEXT_TAGS):
+        parent = element.getparent()
+        while parent.tag != W_P:
+            parent = parent.getparent()
+        if parent is paragraph:
+            elements.append(element)
+    return elements
+
+def _docx_paragraph_text(paragraph: etree._Element) -> str:
+    """
+    Get the text of a paragraph the way python-docx reports it.
+    """
+    parts = []
+    for element in _docx_text_elements(paragraph):
+        if element.tag == W_T:
+            parts.append(element.text or '')
+        elif element.tag == W_TEXT_TAGS[1]:
+            parts.append('\t')
+        else:
+            parts.append('\n')
+    return ''.join(parts)
+
+def _read_docx_paragraphs(source) -> List[str]:
+    """
+    Stream the paragraphs of one XML part and return their texts in
+    document order. Finished paragraphs are discarded as parsing goes, so
+    memory stays bounded by the largest paragraph rather than the part.
+    """
+    texts = []
+    open_paragraphs = []
+    for event, element in etree.iterparse(source, events=('start', 'end'), tag=W_P):
+        if event == 'start':
+            # Nested paragraphs end before their parent; number them in
+            # start order so the rewrite can address them with iter()
+            open_paragraphs.append(len(texts))
+            texts.append(None)
+            continue
+        texts[open_paragraphs.pop()] = _docx_paragraph_text(element)
+        if not open_paragraphs:
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    return texts
+
 def extract_docx_content(file_path: str) -> Tuple[List[str], List[Image.Image]]:
     """
     Extract text and images from a .docx file.
+    
+    The XML parts are streamed directly instead of loading the python-docx
+    object model. Texts are the paragraphs of the body (including tables),
+    then of the headers, footers, footnotes and endnotes. Media parts with
+    identical content are decoded once and shared; each image lists the
+    parts it came from in image.info['docx_parts'] so save_docx can write
+    the package back with only the flagged media replaced.
     """
-    doc = docx.Document(file_path)
     texts = []
     images = []
-    
-    # Extract text
-    for paragraph in doc.paragraphs:
-        texts.append(paragraph.text)
-    
-    # Extract images
-    for rel in doc.part.rels.values():
-        if "image" in rel.target_ref:
-            image_data = rel.target_part.blob
-            image = Image.open(io.BytesIO(image_data))
-            images.append(image)
+    image_cache = {}
+    with zipfile.ZipFile(file_path) as package:
+        text_parts = _docx_text_parts(package)
+        for part in text_parts:
+            with package.open(part) as source:
+                texts.extend(_read_docx_paragraphs(source))
+        
+        for part in _docx_image_parts(package, text_parts):
+            try:
+                image = _open_image(package.read(part), image_cache)
+            except Exception as e:
+                logger.warning("Could not process image %s: %s", part, e)
+                continue
+            parts = image.info.setdefault('docx_parts', [])
+            if not parts:
+                images.append(image)
+            parts.append(part)
     
     return texts, images
 
+def _extract_pdf_page(
+    doc: fitz.Document,
+    page_num: int,
+    image_cache: Dict[tuple, Image.Image]
+) -> Tuple[List[str], List[Image.Image]]:
+    """
+    Extract text blocks and images from a single page of an open PDF.
+    Images already in image_cache (by xref or content hash) are reused
+    instead of being extracted and decoded again.
+    """
+    page = doc[page_num]
+    texts = [text for _, text in _page_text_blocks(page)]
+    images = [image for _, image in _page_images(doc, page_num, image_cache)]
+    return texts, images
+
+def _page_text_blocks(page: fitz.Page) -> List[Tuple[fitz.Rect, str]]:
+    """
+    Get the non-empty text blocks of a page with their bounding boxes.
+    """
+    blocks = []
+    for block in page.get_text("blocks"):
+        # Extract text content from block
+        text = block[4]
+        # Clean the text
+        text = re.sub(r'\s+', ' ', text).strip()
+        if text:
+            blocks.append((fitz.Rect(block[:4]), text))
+    return blocks
+
+def _page_images(
+    doc: fitz.Document,
+    page_num: int,
+    image_cache: Dict[tuple, Image.Image]
+) -> List[Tuple[int, Image.Image]]:
+    """
+    Get the decodable images of a page with their xrefs.
+    """
+    images = []
+    image_list = doc[page_num].get_images(full=True)
+    for img_index, img_info in enumerate(image_list):
+        xref = img_info[0]
+        if ('xref', xref) in image_cache:
+            images.append((xref, image_cache[('xref', xref)]))
+            continue
+        
+        base_image = doc.extract_image(xref)
+        image_bytes = base_image["image"]
+        
+        try:
+            # Convert image bytes to PIL Image
+            image = _open_image(image_bytes, image_cache)
+            image_cache[('xref', xref)] = image
+            images.append((xref, image))
+        except Exception as e:
+            logger.warning("Could not process image %s on page %s: %s", img_index, page_num + 1, e)
+            continue
+    
+    return images
+
 def extract_pdf_content(file_path: str) -> Tuple[List[str], List[Image.Image]]:
     """
     Extract text and images from a PDF file with improved content detection.
@@ -48,45 +286,79 @@ def extract_pdf_content(file_path: str) -> Tuple[List[str], List[Image.Image]]:
     doc = fitz.open(file_path)
     texts = []
     images = []
+    image_cache = {}
     
     for page_num in range(len(doc)):
-        page = doc[page_num]
-        
-        # Extract text with better formatting preservation
-        blocks = page.get_text("blocks")
-        for block in blocks:
-            # Extract text content from block
-            text = block[4]
-            # Clean the text
-            text = re.sub(r'\s+', ' ', text).strip()
-            if text:
-                texts.append(text)
-        
-        # Extract images with better quality
-        image_list = page.get_images(full=True)
-        for img_index, img_info in enumerate(image_list):
-            xref = img_info[0]
-            base_image = doc.extract_image(xref)
-            image_bytes = base_image["image"]
-            
-            # Get image format
-            image_format = base_image["ext"].upper()
-            if image_format == "JPG":
-                image_format = "JPEG"
-            
-            try:
-                # Convert image bytes to PIL Image
-                image = Image.open(io.BytesIO(image_bytes))
-                # Convert to RGB if necessary
-                if image.mode not in ('RGB', 'L'):
-                    image = image.convert('RGB')
-                images.append(image)
-            except Exception as e:
-                print(f"Warning: Could not process image {img_index} on page {page_num + 1}: {str(e)}")
-                continue
+        page_texts, page_images = _extract_pdf_page(doc, page_num, image_cache)
+        texts.extend(page_texts)
+        images.extend(page_images)
     
     return texts, images
 
+def iter_pdf_pages(file_path: str) -> Iterator[Tuple[int, int, List[str], List[Image.Image]]]:
+    """
+    Extract a PDF one page at a time.
+    Yields (page_num, page_count, texts, images) for each page.
+    
+    Decoded images are only shared within a page so memory stays bounded;
+    repeated images across pages are deduplicated by the image filter's
+    verdict cache instead. MuPDF's resource store, which otherwise keeps
+    the streams of every page read (up to 256 MB), is emptied after each
+    page for the same reason.
+    """
+    doc = fitz.open(file_path)
+    try:
+        page_count = len(doc)
+        for page_num in range(page_count):
+            texts, images = _extract_pdf_page(doc, page_num, {})
+            fitz.TOOLS.store_shrink(100)
+            yield page_num, page_count, texts, images
+    finally:
+        doc.close()
+
+def detect_encoding(file_path: str, sample_size: int = 65536) -> str:
+    """
+    Detect the encoding of a text file from a prefix sample instead of
+    reading the whole file.
+    """
+    with open(file_path, 'rb') as file:
+        sample = file.read(sample_size)
+    
+    # Byte order marks identify the encoding directly
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    
+    # Prefer UTF-8 when the sample decodes cleanly; the sample may end
+    # in the middle of a multi-byte character
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    
+    return chardet.detect(sample)['encoding'] or 'utf-8'
+
+def iter_txt_chunks(
+    file_path: str,
+    chunk_lines: int = 2000,
+    encoding: str = None
+) -> Iterator[List[str]]:
+    """
+    Read a .txt file lazily, yielding lists of at most chunk_lines lines.
+    """
+    encoding = encoding or detect_encoding(file_path)
+    with open(file_path, 'r', encoding=encoding, errors='replace') as file:
+        chunk = []
+        for line in file:
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
 def extract_txt_content(file_path: str) -> Tuple[List[str], List[Image.Image]]:
     """
     Extract text from a .txt file (no images).
@@ -95,10 +367,24 @@ def extract_txt_content(file_path: str) -> Tuple[List[str], List[Image.Image]]:
         text = file.readlines()
     return text, []
 
-def save_docx(texts: List[str], images: List[Image.Image], output_path: str):
+def save_docx(
+    texts: List[str],
+    images: List[Image.Image],
+    output_path: str,
+    source_path: Optional[str] = None,
+    removed_spans: Optional[List[List[Tuple[int, int]]]] = None
+):
     """
-    Save processed content to a new .docx file.
+    Save processed content to a .docx file.
+    
+    With source_path, the source package is rewritten instead (see
+    rewrite_docx), keeping tables, headers, styles and media. Otherwise
+    a new document is built from the texts and images.
     """
+    if source_path is not None:
+        rewrite_docx(source_path, output_path, texts, images, removed_spans)
+        return
+    
     doc = docx.Document()
     
     # Add text
@@ -106,84 +392,458 @@ def save_docx(texts: List[str], images: List[Image.Image], output_path: str):
         if text.strip():  # Only add non-empty paragraphs
             doc.add_paragraph(text)
     
-    # Add images
+    # Add images, writing extracted images back in their original encoding
     for img in images:
-        with io.BytesIO() as bio:
-            img.save(bio, format='PNG')
+        with io.BytesIO(_image_bytes(img, DOCX_IMAGE_FORMATS)) as bio:
             doc.add_picture(bio)
     
     doc.save(output_path)
 
-def save_pdf(texts: List[str], images: List[Image.Image], output_path: str):
+def _removed_spans(text: str, filtered: str) -> List[Tuple[int, int]]:
     """
-    Save processed content to a new PDF file with better formatting.
+    Estimate the character spans of text that the text filter left out of
+    filtered, which holds the remaining tokens joined by spaces, by lining
+    the tokens up greedily. Used when the filter's own spans are not given.
+    """
+    kept = filtered.split(' ')
+    spans = []
+    position = 0
+    for token, span in zip(tokenize(text), token_spans(text)):
+        if position < len(kept) and token == kept[position]:
+            position += 1
+        else:
+            spans.append(span)
+    return spans
+
+def _docx_cuts(text: str, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Widen removed spans so no doubled or dangling space is left at a cut:
+    the spaces after a span go when it starts the text or follows a space,
+    and the spaces before it go when it ends the text or is followed by
+    punctuation. Overlapping cuts are merged.
     """
-    doc = fitz.open()
-    current_page = doc.new_page()
+    cuts = []
+    for start, end in sorted(spans):
+        before = text[start - 1] if start > 0 else None
+        after = text[end] if end < len(text) else None
+        if before in (None, ' ') and after == ' ':
+            while end < len(text) and text[end] == ' ':
+                end += 1
+        elif before == ' ' and (after is None or not (after.isalnum() or after.isspace())):
+            while start > 0 and text[start - 1] == ' ':
+                start -= 1
+        if cuts and start <= cuts[-1][1]:
+            cuts[-1] = (cuts[-1][0], max(cuts[-1][1], end))
+        else:
+            cuts.append((start, end))
+    return cuts
+
+def _filter_docx_paragraph(
+    paragraph: etree._Element,
+    filtered: str,
+    spans: Optional[List[Tuple[int, int]]] = None
+) -> bool:
+    """
+    Apply the filtered text of a paragraph to its XML.
     
-    # PDF formatting parameters
-    margin_x = 50
-    margin_y = 50
-    y_position = margin_y
-    page_height = current_page.rect.height
-    page_width = current_page.rect.width
-    line_height = 15
+    Paragraphs the filter kept are left alone. Removed paragraphs lose
+    their text but keep their properties, like the empty line the other
+    formats leave. When words were removed, exactly those occurrences are
+    cut out of the runs holding them, so the formatting of the rest is
+    kept. spans are the removed (start, end) character offsets in the
+    stripped paragraph text, as TextFilter.removed_spans gives them; if
+    None, they are estimated from filtered.
     
-    # Add text with proper formatting
-    for text in texts:
-        if not text.strip():
-            continue
-            
-        # Check if we need a new page
-        if y_position + line_height > page_height - margin_y:
-            current_page = doc.new_page()
-            y_position = margin_y
+    Returns True if the paragraph changed.
+    """
+    raw = _docx_paragraph_text(paragraph)
+    text = raw.strip()
+    kept = filtered.strip()
+    if not text or kept == text or kept == ' '.join(tokenize(text)):
+        return False
+    
+    elements = _docx_text_elements(paragraph)
+    if kept:
+        if spans is None:
+            spans = _removed_spans(text, kept)
+        offset = len(raw) - len(raw.lstrip())
+        cuts = _docx_cuts(raw, [(start + offset, end + offset) for start, end in spans])
+        if not cuts:
+            return False
         
-        # Add text with proper formatting
-        current_page.insert_text(
-            point=(margin_x, y_position),
-            text=text,
-            fontsize=11,
-            fontname="helv"
-        )
-        y_position += line_height * (text.count('\n') + 1.5)
-    
-    # Add images
-    for img in images:
-        # Convert PIL image to bytes
-        with io.BytesIO() as bio:
-            img.save(bio, format='PNG')
-            img_bytes = bio.getvalue()
+        # Cut each element's share of the removed ranges out of it
+        position = 0
+        remove = []
+        for element in elements:
+            length = len(element.text or '') if element.tag == W_T else 1
+            start, end = position, position + length
+            position = end
+            overlaps = [(max(cut_start, start), min(cut_end, end)) for cut_start, cut_end in cuts
+                        if cut_start < end and cut_end > start]
+            if not overlaps:
+                continue
+            if element.tag != W_T:
+                remove.append(element)
+                continue
+            pieces = []
+            cursor = start
+            for cut_start, cut_end in overlaps:
+                pieces.append(element.text[cursor - start:cut_start - start])
+                cursor = cut_end
+            pieces.append(element.text[cursor - start:])
+            element.text = ''.join(pieces)
+            if not element.text:
+                remove.append(element)
+            elif element.text != element.text.strip():
+                element.set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+        elements = remove
+    
+    for element in elements:
+        element.getparent().remove(element)
+    return True
+
+def _blank_image_bytes(image_bytes: bytes) -> bytes:
+    """
+    Encode a blank 1x1 image in the format of image_bytes, to replace a
+    flagged image without changing its part name or content type.
+    """
+    try:
+        image_format = Image.open(io.BytesIO(image_bytes)).format
+    except Exception:
+        image_format = 'PNG'
+    blank = Image.new('RGB', (1, 1), 'white')
+    with io.BytesIO() as bio:
+        try:
+            blank.save(bio, format=image_format)
+        except (KeyError, OSError, ValueError):
+            bio.seek(0)
+            bio.truncate()
+            blank.save(bio, format='PNG')
+        return bio.getvalue()
+
+def rewrite_docx(
+    source_path: str,
+    output_path: str,
+    texts: List[str],
+    images: List[Image.Image],
+    removed_spans: Optional[List[List[Tuple[int, int]]]] = None
+):
+    """
+    Write a filtered copy of a .docx package.
+    
+    Args:
+        source_path: The .docx the texts and images were extracted from
+        output_path: Where to write the filtered package
+        texts: Filtered text of every paragraph, in extract_docx_content order
+        images: The extracted images that were kept; other decodable
+            images are replaced by a blank image
+        removed_spans: Character spans the lexicon removed from each
+            paragraph (TextFilter.removed_spans of its record); estimated
+            from texts if not given
+    
+    Only text parts with a changed paragraph and the replaced media are
+    rewritten; every other part is copied through unchanged.
+    """
+    kept_images = {part for image in images for part in image.info.get('docx_parts', [])}
+    replacements = {}
+    with zipfile.ZipFile(source_path) as package:
+        text_parts = _docx_text_parts(package)
+        position = 0
+        for part in text_parts:
+            root = etree.fromstring(package.read(part))
+            changed = False
+            for paragraph in root.iter(W_P):
+                spans = None
+                if removed_spans is not None and position < len(removed_spans):
+                    spans = removed_spans[position]
+                if position < len(texts) and _filter_docx_paragraph(paragraph, texts[position], spans):
+                    changed = True
+                position += 1
+            if changed:
+                replacements[part] = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+        
+        for part in _docx_image_parts(package, text_parts):
+            if part not in kept_images:
+                image_bytes = package.read(part)
+                try:
+                    Image.open(io.BytesIO(image_bytes))
+                except Exception:
+                    continue  # Never extracted, so never checked
+                replacements[part] = _blank_image_bytes(image_bytes)
+        
+        temp_path = output_path + ".tmp"
+        with zipfile.ZipFile(temp_path, 'w') as output:
+            for info in package.infolist():
+                data = replacements.get(info.filename)
+                output.writestr(info, data if data is not None else package.read(info))
+    os.replace(temp_path, output_path)
+
+class PdfWriter:
+    def __init__(self, output_path: str, flush_pages: int = 4):
+        """
+        Build a new PDF incrementally; text and images can be added in
+        several rounds, e.g. one input page at a time.
+        
+        Finished pages are appended to a file next to output_path every
+        flush_pages pages, so only the pages since the last flush (and
+        their images) are held in memory.
+        """
+        self.output_path = output_path
+        self.flush_pages = flush_pages
+        self.temp_path = output_path + ".tmp"
+        self.flushed = False
+        self.doc = fitz.open()
+        self.current_page = self.doc.new_page()
+        
+        # PDF formatting parameters
+        self.margin_x = 50
+        self.margin_y = 50
+        self.y_position = self.margin_y
+        self.page_height = self.current_page.rect.height
+        self.page_width = self.current_page.rect.width
+        self.line_height = 15
+    
+    def _ensure_space(self, height: float):
+        """
+        Start a new page if the next item does not fit on the current one.
+        """
+        if self.y_position + height > self.page_height - self.margin_y:
+            if len(self.doc) >= self.flush_pages:
+                self._flush()
+            self.current_page = self.doc.new_page()
+            self.y_position = self.margin_y
+    
+    def _flush(self):
+        """
+        Append the pages held in memory to the temporary file with an
+        incremental save, which writes only the new objects, and start an
+        empty in-memory document for the following pages.
+        """
+        if not self.flushed:
+            self.doc.save(self.temp_path)
+            self.flushed = True
+        else:
+            output = fitz.open(self.temp_path)
+            try:
+                output.insert_pdf(self.doc)
+                output.saveIncr()
+            finally:
+                output.close()
+        self.doc.close()
+        self.doc = fitz.open()
+    
+    def add_texts(self, texts: List[str]):
+        """
+        Add text with proper formatting.
+        """
+        for text in texts:
+            if not text.strip():
+                continue
+                
+            # Check if we need a new page
+            self._ensure_space(self.line_height)
             
+            # Add text with proper formatting
+            self.current_page.insert_text(
+                point=(self.margin_x, self.y_position),
+                text=text,
+                fontsize=11,
+                fontname="helv"
+            )
+            self.y_position += self.line_height * (text.count('\n') + 1.5)
+    
+    def add_images(self, images: List[Image.Image]):
+        """
+        Add images below the current content. Extracted images are written
+        with their original bytes instead of being re-encoded.
+        """
+        for img in images:
             # Check if we need a new page
-            if y_position + 300 > page_height - margin_y:
-                current_page = doc.new_page()
-                y_position = margin_y
+            self._ensure_space(300)
             
             # Calculate image dimensions while maintaining aspect ratio
-            img_width = min(page_width - 2 * margin_x, 500)
+            img_width = min(self.page_width - 2 * self.margin_x, 500)
             img_height = min(300, img_width * img.size[1] / img.size[0])
             
             # Define image rectangle
             img_rect = fitz.Rect(
-                margin_x,
-                y_position,
-                margin_x + img_width,
-                y_position + img_height
+                self.margin_x,
+                self.y_position,
+                self.margin_x + img_width,
+                self.y_position + img_height
             )
             
-            # Insert image
-            current_page.insert_image(img_rect, stream=img_bytes)
-            y_position += img_height + line_height
+            # Insert the original encoded bytes when there are any, and
+            # fall back to PNG if PyMuPDF cannot read them
+            try:
+                self.current_page.insert_image(img_rect, stream=_image_bytes(img))
+            except Exception:
+                self.current_page.insert_image(img_rect, stream=_encode_image(img))
+            self.y_position += img_height + self.line_height
     
-    doc.save(output_path)
-    doc.close()
+    def close(self):
+        """
+        Save the PDF to output_path.
+        """
+        if not self.flushed:
+            self.doc.save(self.output_path)
+            self.doc.close()
+            return
+        if len(self.doc) > 0:
+            self._flush()
+        self.doc.close()
+        os.replace(self.temp_path, self.output_path)
+
+def save_pdf(texts: List[str], images: List[Image.Image], output_path: str):
+    """
+    Save processed content to a new PDF file with better formatting.
+    """
+    writer = PdfWriter(output_path)
+    writer.add_texts(texts)
+    writer.add_images(images)
+    writer.close()
+
+class PdfRedactor:
+    def __init__(self, input_path: str):
+        """
+        Remove flagged content from a copy of the source PDF instead of
+        rebuilding it: flagged text is redacted where it stands and flagged
+        images are replaced, so layout, fonts and untouched content are
+        kept and the work done grows with the number of removals.
+        """
+        self.input_path = input_path
+        self.doc = fitz.open(input_path)
+        self.deleted_xrefs = set()
+        self.redacted_areas = 0
+
+    def pages(self) -> Iterator[Tuple[int, int, List[Tuple[fitz.Rect, str]], List[Tuple[int, Image.Image]]]]:
+        """
+        Walk the document one page at a time.
+        Yields (page_num, page_count, text_blocks, images), where
+        text_blocks are (rect, text) pairs in the order extract_pdf_content
+        returns the texts, and images are (xref, image) pairs.
+        """
+        page_count = len(self.doc)
+        for page_num in range(page_count):
+            blocks = _page_text_blocks(self.doc[page_num])
+            yield page_num, page_count, blocks, _page_images(self.doc, page_num, {})
+
+    def _span_rects(
+        self,
+        page: fitz.Page,
+        block_rect: fitz.Rect,
+        text: str,
+        spans: List[Tuple[int, int]]
+    ) -> Optional[List[fitz.Rect]]:
+        """
+        Map character spans of a block's text, as _page_text_blocks returns
+        it, to the rectangles of those characters on the page, one per line
+        a span touches. Returns None if the block's characters cannot be
+        lined up with its text.
+        """
+        # Characters in reading order, with whitespace collapsed like the
+        # block text; line breaks become spaces. Glyph boxes span the full
+        # line height and overlap the lines above and below, which the
+        # redaction would also erase, so each box is cut to the band
+        # between the baseline and about the cap height
+        chars = []
+        for block in page.get_text("rawdict", clip=block_rect)["blocks"]:
+            for line_num, line in enumerate(block.get("lines", [])):
+                for span in line["spans"]:
+                    for char in span["chars"]:
+                        if not char["c"].isspace():
+                            x0, _, x1, _ = char["bbox"]
+                            baseline = char["origin"][1]
+                            box = (x0, baseline - 0.7 * span["size"], x1, baseline)
+                            chars.append((char["c"], (block["number"], line_num), box))
+                        elif chars and chars[-1][0] != ' ':
+                            chars.append((' ', None, None))
+                if chars and chars[-1][0] != ' ':
+                    chars.append((' ', None, None))
+        while chars and chars[-1][0] == ' ':
+            chars.pop()
+        if ''.join(char for char, _, _ in chars) != text:
+            return None
+
+        rects = []
+        for start, end in spans:
+            by_line = {}
+            for _, line, bbox in chars[start:end]:
+                if line is not None:
+                    by_line[line] = by_line.get(line, fitz.Rect(bbox)) | fitz.Rect(bbox)
+            rects.extend(by_line.values())
+        return rects
+
+    def redact_page(
+        self,
+        page_num: int,
+        block_rects: List[fitz.Rect],
+        span_removals: List[Tuple[fitz.Rect, str, List[Tuple[int, int]]]],
+        image_xrefs: List[int]
+    ):
+        """
+        Remove flagged content from one page.
+
+        Args:
+            page_num: Page to redact
+            block_rects: Text blocks to remove entirely
+            span_removals: (block_rect, text, spans) triples; the characters
+                of each (start, end) span of the block's text are removed.
+                A block whose characters cannot be lined up with its text
+                is removed entirely
+            image_xrefs: Images to remove
+        """
+        page = self.doc[page_num]
+        rects = list(block_rects)
+        for block_rect, text, spans in span_removals:
+            span_rects = self._span_rects(page, block_rect, text, spans)
+            if span_rects is None:
+                logger.warning("Could not locate removed text on page %s, redacting its block", page_num + 1)
+                span_rects = [block_rect]
+            rects.extend(span_rects)
+
+        if rects:
+            for rect in rects:
+                page.add_redact_annot(rect, fill=(0, 0, 0))
+            # Only the covered text goes; images and line art stay. PyMuPDF
+            # 1.24 and later remove covered line art unless told not to, older
+            # releases never touch it and do not take the argument.
+            options = {"images": fitz.PDF_REDACT_IMAGE_NONE}
+            if hasattr(fitz, "PDF_REDACT_LINE_ART_NONE"):
+                options["graphics"] = fitz.PDF_REDACT_LINE_ART_NONE
+            page.apply_redactions(**options)
+            self.redacted_areas += len(rects)
+
+        for xref in image_xrefs:
+            # Replacing the image stream removes it from every page using it
+            if xref not in self.deleted_xrefs:
+                page.delete_image(xref)
+                self.deleted_xrefs.add(xref)
+
+    def save(self, output_path: str):
+        """
+        Save the redacted document with garbage collection, so removed
+        text and image streams are not left behind in the file as they
+        would be after an incremental save.
+        """
+        temp_path = output_path + ".tmp"
+        try:
+            self.doc.save(temp_path, garbage=3, deflate=True)
+        finally:
+            self.doc.close()
+        os.replace(temp_path, output_path)
 
 def save_txt(texts: List[str], output_path: str):
     """
     Save processed text to a new .txt file.
     """
     with open(output_path, 'w', encoding='utf-8') as file:
-        for text in texts:
-            if text.strip():  # Only write non-empty lines
-                file.write(text + '\n') 
\ No newline at end of file
+        write_txt_lines(file, texts)
+
+def write_txt_lines(file: TextIO, texts: List[str]):
+    """
+    Append processed text to an open .txt file, e.g. one chunk at a time.
+    """
+    for text in texts:
+        if text.strip():  # Only write non-empty lines
+            file.write(text + '\n') 
\ No newline at end of file